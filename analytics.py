@@ -0,0 +1,222 @@
+# analytics.py
+#
+# Occupancy reports over the full booking history (requires NumPy):
+#   python analytics.py --out reports                 # CSV files, one per report
+#   python analytics.py --out reports --format json   # a single summary.json
+#   python analytics.py --venue north --out reports   # another venue's history
+# The history is converted once into integer columns and a dense occupancy tensor
+# (week x day x court x slot); every report is a reduction over those arrays.
+
+import os
+import csv
+import json
+import argparse
+from datetime import date
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("analytics.py requires NumPy, which is not installed (pip install numpy).") from error
+import config
+from availability_grid import DAY_NAMES, DAY_INDEX
+from calendar_days import parse_date, week_key
+from storage import CsvBookingStore, PartitionedBookingStore, SqliteBookingStore, iter_bookings, partitions_dir
+from venues import get_venue
+
+# Statuses that occupied a court (canceled bookings freed it again)
+NO_SHOW_STATUSES = ('no_show', 'no-show')
+OCCUPYING_STATUSES = ('active', 'completed', 'expired') + NO_SHOW_STATUSES
+
+
+def history_bookings(venue=None, file_path=None, backend=None):
+    """Yield every booking a venue ever stored: archived history, snapshots, journals and all week partitions."""
+    venue = venue or get_venue()
+    file_path = file_path or venue.bookings_path
+    backend = backend or config.STORAGE_BACKEND
+    if backend == "sqlite":
+        yield from SqliteBookingStore(venue.sqlite_path).load()
+        return
+    if config.CALENDAR_DATES and os.path.isdir(partitions_dir(file_path)):
+        store = PartitionedBookingStore(partitions_dir(file_path))
+        for key in store.stored_weeks():
+            yield from store.partition(key).load()
+        return
+    store = CsvBookingStore(file_path)
+    yield from iter_bookings(store.history_path)
+    yield from store.load()
+
+
+class BookingArrays:
+    def __init__(self, bookings, venue=None):
+        """Convert a venue's bookings into parallel integer arrays in one pass, skipping rows that cannot be placed."""
+        venue = venue or get_venue()
+        courts, slots = venue.courts, venue.slots
+        self.skipped = 0  # Bookings with an unknown court or day, or malformed times
+        court_index = {court: i for i, court in enumerate(courts)}
+        weeks, users, statuses = {}, {}, {}
+        # Distinct days and time ranges are few, so each is resolved once and then looked up
+        days, spans = {}, {}
+        columns = {name: [] for name in ('week', 'day', 'court', 'start', 'length', 'status', 'user')}
+        for booking in bookings:
+            resolved = days.get(booking.day)
+            if resolved is None:
+                day_date = parse_date(booking.day)
+                # Undated (weekday name) bookings all fall in one unnamed week
+                key = week_key(day_date) if day_date else ""
+                day = day_date.weekday() if day_date else DAY_INDEX.get(booking.day)
+                resolved = days[booking.day] = (weeks.setdefault(key, len(weeks)), day)
+            week, day = resolved
+            court = court_index.get(booking.court_id)
+            if court is None or day is None:
+                self.skipped += 1
+                continue
+            times = (booking.start_time, booking.end_time)
+            if times not in spans:
+                try:
+                    spans[times] = slots.slot_range(*times)
+                except ValueError:
+                    spans[times] = None  # Not HH:MM AM/PM times
+            span = spans[times]
+            if span is None:
+                self.skipped += 1
+                continue
+            columns['week'].append(week)
+            columns['day'].append(day)
+            columns['court'].append(court)
+            columns['start'].append(span[0])
+            columns['length'].append(span[1])
+            columns['status'].append(statuses.setdefault(booking.status, len(statuses)))
+            columns['user'].append(users.setdefault((booking.username or "").upper(), len(users)))
+
+        self.courts = list(courts)
+        self.slots = slots
+        # Weeks are renumbered in chronological order so the week axis is sorted
+        self.week_keys = sorted(weeks)
+        week_order = np.array([self.week_keys.index(key) for key in weeks], dtype=np.int64)
+        self.user_names = list(users)
+        self.status_names = list(statuses)
+        self.week = week_order[np.array(columns['week'], dtype=np.int64)] if weeks else np.zeros(0, dtype=np.int64)
+        self.day = np.array(columns['day'], dtype=np.int64)
+        self.court = np.array(columns['court'], dtype=np.int64)
+        self.start = np.array(columns['start'], dtype=np.int64)
+        self.length = np.array(columns['length'], dtype=np.int64)
+        self.status = np.array(columns['status'], dtype=np.int64)
+        self.user = np.array(columns['user'], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.day)
+
+    def status_mask(self, names):
+        """Return a boolean array marking bookings whose status is one of `names`."""
+        codes = [code for code, name in enumerate(self.status_names) if name in names]
+        return np.isin(self.status, codes)
+
+    def occupancy(self, by_week=False):
+        """
+        Return the occupancy tensor: booked-slot counts as [week x] day x court x slot.
+        Each booking adds +1 at its start and -1 after its end; a cumulative sum along the slot axis fills the runs.
+        """
+        mask = self.status_mask(OCCUPYING_STATUSES) & (self.length > 0)
+        weeks = len(self.week_keys) if by_week else 1
+        week = self.week[mask] if by_week else np.zeros(mask.sum(), dtype=np.int64)
+        index = (week, self.day[mask], self.court[mask])
+        edges = np.zeros((weeks, len(DAY_NAMES), len(self.courts), self.slots.count + 1), dtype=np.int32)
+        np.add.at(edges, index + (self.start[mask],), 1)
+        np.add.at(edges, index + (self.start[mask] + self.length[mask],), -1)
+        tensor = np.cumsum(edges, axis=-1)[..., :self.slots.count]
+        return tensor if by_week else tensor[0]
+
+
+def utilization(arrays):
+    """Return the share of weeks each (day, court, slot) was booked, as day x court x slot."""
+    weeks = max(1, len(arrays.week_keys))
+    return np.minimum(arrays.occupancy(by_week=True), 1).sum(axis=0) / weeks
+
+
+def peak_hours(arrays):
+    """Return the average share of courts booked in each slot (the peak-hour curve)."""
+    return utilization(arrays).mean(axis=(0, 1))
+
+
+def cancellation_rates(arrays):
+    """Return (bookings, canceled, rate) arrays indexed by user code."""
+    users = len(arrays.user_names)
+    totals = np.bincount(arrays.user, minlength=users)
+    canceled = np.bincount(arrays.user[arrays.status_mask(('canceled',))], minlength=users)
+    return totals, canceled, np.divide(canceled, totals, out=np.zeros(users), where=totals > 0)
+
+
+def no_show_trend(arrays):
+    """Return (bookings, no-shows, rate) arrays indexed by week."""
+    weeks = max(1, len(arrays.week_keys))
+    totals = np.bincount(arrays.week, minlength=weeks)
+    no_shows = np.bincount(arrays.week[arrays.status_mask(NO_SHOW_STATUSES)], minlength=weeks)
+    return totals, no_shows, np.divide(no_shows, totals, out=np.zeros(weeks), where=totals > 0)
+
+
+def build_reports(arrays):
+    """Compute every report as a dictionary of row lists."""
+    usage = utilization(arrays)
+    days, courts, slots = np.nonzero(usage)
+    totals, canceled, rates = cancellation_rates(arrays)
+    week_totals, no_shows, no_show_rates = no_show_trend(arrays)
+    week_labels = [key or "undated" for key in arrays.week_keys] or ["undated"]
+    order = np.argsort(-rates, kind="stable")
+    return {
+        "utilization": [
+            {"day": DAY_NAMES[d], "court": arrays.courts[c], "time": arrays.slots.times[s], "utilization": round(float(usage[d, c, s]), 4)}
+            for d, c, s in zip(days.tolist(), courts.tolist(), slots.tolist())
+        ],
+        "peak_hours": [
+            {"time": time_str, "utilization": round(float(value), 4)}
+            for time_str, value in zip(arrays.slots.times, peak_hours(arrays).tolist())
+        ],
+        "user_cancellations": [
+            {"username": arrays.user_names[u], "bookings": int(totals[u]), "canceled": int(canceled[u]),
+             "cancellation_rate": round(float(rates[u]), 4)}
+            for u in order.tolist()
+        ],
+        "no_show_trend": [
+            {"week": week_labels[w], "bookings": int(week_totals[w]), "no_shows": int(no_shows[w]),
+             "no_show_rate": round(float(no_show_rates[w]), 4)}
+            for w in range(len(week_totals))
+        ],
+    }
+
+
+def write_reports(reports, directory, output_format="csv"):
+    """Write the reports as one CSV file each, or as a single summary.json. Returns the paths written."""
+    os.makedirs(directory, exist_ok=True)
+    if output_format == "json":
+        path = os.path.join(directory, "summary.json")
+        with open(path, "w") as file:
+            json.dump({"generated": date.today().isoformat(), **reports}, file, indent=2)
+        return [path]
+    paths = []
+    for name, rows in reports.items():
+        path = os.path.join(directory, f"{name}.csv")
+        with open(path, "w", newline='') as file:
+            if rows:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write occupancy and cancellation reports over the booking history.")
+    parser.add_argument("--venue", default=None, help="venue to report on (default: the default venue)")
+    parser.add_argument("--bookings", default=None, help="bookings CSV snapshot (CSV backend; default: the venue's)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=None)
+    parser.add_argument("--out", default="reports", help="output directory")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    args = parser.parse_args()
+
+    venue = get_venue(args.venue)
+    bookings = history_bookings(venue, args.bookings, args.backend)
+    arrays = BookingArrays(bookings, venue)
+    for path in write_reports(build_reports(arrays), args.out, args.format):
+        print(f"Wrote {path}")
+    print(f"{len(arrays)} bookings over {max(1, len(arrays.week_keys))} week(s).")
+    if arrays.skipped:
+        print(f"Skipped {arrays.skipped} bookings with an unknown court or day, or malformed times.")
@@ -0,0 +1,73 @@
+# availability_grid.py
+
+from config import VALID_TIME_SLOTS
+
+# Courts and days covered by the grid
+COURTS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+DAYS_PER_WEEK = 7
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAY_INDEX = {day: i for i, day in enumerate(DAY_NAMES)}
+
+# 1. Separating Functions and Data:
+# Each (day, court) pair is stored as a single integer bitmask. Bit i is set when the
+# slot VALID_TIME_SLOTS[i] is booked, so a whole day of one court costs one int.
+class AvailabilityGrid:
+    def __init__(self, courts=COURTS, time_slots=VALID_TIME_SLOTS, days=DAYS_PER_WEEK):
+        """Initialize an empty (fully available) grid."""
+        self.courts = list(courts)
+        self.time_slots = list(time_slots)
+        self.slot_count = len(self.time_slots)
+        self.full_mask = (1 << self.slot_count) - 1
+        self.court_index = {court: i for i, court in enumerate(self.courts)}  # 10. List Comprehensions
+        self.slot_index = {time_str: i for i, time_str in enumerate(self.time_slots)}
+        self.masks = [[0] * len(self.courts) for _ in range(days)]
+
+    def run_mask(self, start, length):
+        """Return a bitmask covering `length` slots starting at slot `start`."""
+        return ((1 << length) - 1) << start
+
+    def is_run_free(self, day, court, start, length):
+        """Check whether `length` consecutive slots from `start` are free on a court."""
+        if length <= 0 or start < 0 or start + length > self.slot_count:
+            return False
+        return not self.masks[day][self.court_index[court]] & self.run_mask(start, length)
+
+    def is_slot_free(self, day, court, slot):
+        """Check whether a single slot is free on a court."""
+        return not (self.masks[day][self.court_index[court]] >> slot) & 1
+
+    def free_courts(self, day, slot):
+        """Return the courts that are free at the given slot, in court order."""
+        # 7. Filtering: one shift-and-test per court
+        return [court for court, mask in zip(self.courts, self.masks[day]) if not (mask >> slot) & 1]
+
+    def free_run_starts(self, day, court, length):
+        """Return a bitmask of every slot where a run of `length` free slots starts."""
+        if length <= 0 or length > self.slot_count:
+            return 0
+        free = ~self.masks[day][self.court_index[court]] & self.full_mask
+        starts = free
+        for offset in range(1, length):
+            starts &= free >> offset
+        return starts
+
+    def is_day_full(self, day):
+        """Check whether every court is booked for every slot of a day."""
+        return all(mask == self.full_mask for mask in self.masks[day])
+
+    def book(self, day, court, start, length):
+        """Mark a run of slots as booked."""
+        self.masks[day][self.court_index[court]] |= self.run_mask(start, length) & self.full_mask
+
+    def release(self, day, court, start, length):
+        """Mark a run of slots as available again."""
+        self.masks[day][self.court_index[court]] &= ~self.run_mask(start, length)
+
+    def shift(self, days):
+        """Drop the first `days` days and append as many empty days (the horizon moved forward)."""
+        days = min(days, len(self.masks))
+        self.masks = self.masks[days:] + [[0] * len(self.courts) for _ in range(days)]
+
+    def clear(self):
+        """Mark every slot on every court and day as available."""
+        self.masks = [[0] * len(self.courts) for _ in self.masks]
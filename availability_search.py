@@ -0,0 +1,114 @@
+# availability_search.py
+
+from collections import OrderedDict
+import config
+from config import SEARCH_WINDOW_HOURS, SEARCH_RESULT_LIMIT
+import instrumentation
+
+
+def court_preference_order(courts, preferred_court):
+    """Return the courts with the preferred court first, the rest in their usual order."""
+    return [preferred_court] + [court for court in courts if court != preferred_court]  # 10. List Comprehensions
+
+
+@instrumentation.instrument("availability_search")
+def find_alternative_slots(court_filter, day, preferred_time, preferred_court, duration,
+                           search_window=SEARCH_WINDOW_HOURS, limit=SEARCH_RESULT_LIMIT, court_order=None):
+    """
+    Return up to `limit` free runs of `duration` hours within `search_window` hours of the preferred time.
+    Results are ranked best-first: by distance from the preferred time, then by court preference, then
+    earlier start. The cost is bounded by courts x window slots; nothing recurses.
+    """
+    grid = court_filter.grid
+    slots = court_filter.slots
+    length = slots.duration_slots(duration)
+    if length is None or not 0 <= day < len(grid.masks):
+        return []
+
+    # Off-grid preferred times are anchored to the nearest slot
+    preferred_minutes = slots.to_minutes(preferred_time)
+    anchor = round((preferred_minutes - slots.minutes[0]) / slots.slot_minutes)
+    window_slots = int(search_window * 60 // slots.slot_minutes)
+    courts = court_order or court_preference_order(grid.courts, preferred_court)
+
+    # One bitmask per court marks every slot where a free run of `length` starts
+    run_starts = [(court, grid.free_run_starts(day, court, length)) for court in courts if court in grid.court_index]
+    if instrumentation.ENABLED:
+        instrumentation.count_rows("availability_search", len(run_starts))
+
+    results = []
+    # Best-first: expand outward from the anchor one slot distance at a time
+    for distance in range(window_slots + 1):
+        offsets = (0,) if distance == 0 else (-distance, distance)
+        for court, starts in run_starts:
+            for offset in offsets:
+                start = anchor + offset
+                if 0 <= start < slots.count and (starts >> start) & 1:
+                    results.append({
+                        'court': court,
+                        'time': slots.times[start],
+                        'slots': list(slots.times[start:start + length]),
+                        'type': 'preferred' if court == preferred_court and slots.times[start] == preferred_time else 'alternative',
+                        'distance': abs(slots.minutes[start] - preferred_minutes)
+                    })
+                    if len(results) >= limit:
+                        return results
+    return results
+
+
+# Search results are remembered per (day, time, court, duration, window, limit). Each entry records the
+# generation of every (day, court) it was computed from; CourtFilter bumps a (day, court) generation on
+# each create or cancel there, so a change invalidates only the entries of that day, and stale entries
+# are recomputed (and replaced) on their next lookup.
+class SearchCache:
+    def __init__(self, capacity=None):
+        """Initialize an empty LRU cache of search results."""
+        self.capacity = config.SEARCH_CACHE_SIZE if capacity is None else capacity
+        self.entries = OrderedDict()  # key -> (generations, results)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # Misses caused by a booking change since the entry was stored
+
+    def lookup(self, key, generations):
+        """Return the cached results for key if they were computed at these generations, otherwise None."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == generations:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        if entry is not None:
+            self.stale += 1
+            del self.entries[key]
+        return None
+
+    def store(self, key, generations, results):
+        """Remember results, evicting the least recently used entry when full."""
+        if self.capacity <= 0:
+            return
+        self.entries[key] = (generations, results)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every entry (the counters are kept)."""
+        self.entries.clear()
+
+    def stats(self):
+        """Return the hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+def cached_alternative_slots(court_filter, day, preferred_time, preferred_court, duration,
+                             search_window=SEARCH_WINDOW_HOURS, limit=SEARCH_RESULT_LIMIT):
+    """find_alternative_slots through the court filter's result cache. The results are shared; do not modify them."""
+    key = (day, preferred_time, preferred_court, duration, search_window, limit)
+    generations = court_filter.day_generations(day)
+    results = court_filter.search_cache.lookup(key, generations)
+    if results is None:
+        results = find_alternative_slots(court_filter, day, preferred_time, preferred_court, duration, search_window, limit)
+        court_filter.search_cache.store(key, generations, results)
+    return results
@@ -0,0 +1,103 @@
+# batch.py
+#
+# Non-interactive batch mode: runs a stream of JSON-line operations against one loaded venue
+# and writes one JSON-line result per operation, in order:
+#   python batch.py operations.jsonl > results.jsonl
+#   nightly_export | python batch.py --venue north -
+# Operations use the TCP server's protocol ("op" plus its fields and an optional "id"), but each carries
+# the "username" it acts for instead of logging in:
+#   {"op": "signup", "username": "ann", "password": "..."}
+#   {"op": "create", "username": "ann", "court": "A", "day": "Monday", "start_time": "10:00 AM", "duration": 1}
+#   {"op": "cancel", "username": "ann", "booking_id": 12}
+#   {"op": "query", "day": "Monday", "time": "10:00 AM", "court": "A", "duration": 1}
+#   {"op": "view", "username": "ann"}
+# Writes are grouped: every GROUP_SIZE operations are persisted with one store write, and their
+# results are emitted once that write has completed.
+
+import sys
+import json
+import argparse
+import itertools
+from booking_server import BookingServer, RequestError
+from venues import get_venue
+import users
+
+# Operations per persisted group
+GROUP_SIZE = 1000
+
+
+class BatchRunner(BookingServer):
+    def __init__(self, venue=None, users_data=None):
+        """Load the venue's booking state once for a whole batch."""
+        super().__init__(users_data=users_data, venue=venue)
+        self.read_handlers["query"] = self.handle_availability
+        self.write_handlers["signup"] = self.handle_signup
+
+    def run_one(self, request):
+        """Run one operation and return its result; an unexpected error fails only that operation."""
+        if not isinstance(request, dict):
+            return {"id": None, "ok": False, "error": "Invalid JSON request."}
+        op = request.get("op")
+        # Batch operations are trusted: they name the user they act for
+        username = str(request.get("username") or "").strip().upper() or None
+        try:
+            if op in self.write_handlers:
+                return self.dispatch(self.write_handlers[op], request, username)
+            if op in self.read_handlers:
+                return self.dispatch(self.read_handlers[op], request, {"username": username})
+        except Exception as error:
+            return {"id": request.get("id"), "ok": False, "error": f"Internal error: {error!r}"}
+        return {"id": request.get("id"), "ok": False, "error": f"Unknown operation: {op}"}
+
+    def run(self, lines, output, group_size=GROUP_SIZE):
+        """Run JSON-line operations, writing results as each group is persisted. Returns (operations, failures)."""
+        count = failures = 0
+        lines = (line for line in lines if line.strip())
+        while True:
+            group = list(itertools.islice(lines, group_size))
+            if not group:
+                break
+            with self.bookings.grouped_writes():
+                results = [self.run_one(parse_request(line)) for line in group]
+            output.writelines(json.dumps(result) + "\n" for result in results)
+            output.flush()
+            count += len(results)
+            failures += sum(not result["ok"] for result in results)
+        return count, failures
+
+    def handle_signup(self, request, username):
+        if not username:
+            raise RequestError("Please provide a username.")
+        password = str(request.get("password") or "")
+        if not password:
+            raise RequestError("Please provide a password.")
+        if username in self.users_data:
+            raise RequestError("Username already exists.")
+        password_hash = users.save_user(username, password)
+        if isinstance(self.users_data, dict):
+            self.users_data[username] = password_hash
+        return {"username": username}
+
+
+def parse_request(line):
+    """Parse one JSON line, returning None if it is not valid JSON."""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run JSON-line booking operations non-interactively.")
+    parser.add_argument("operations", nargs="?", default="-", help="JSONL operations file ('-' for stdin)")
+    parser.add_argument("--venue", default=None, help="venue to operate on (default: the default venue)")
+    parser.add_argument("--out", default="-", help="JSONL results file ('-' for stdout)")
+    parser.add_argument("--group-size", type=int, default=GROUP_SIZE, help="operations per persisted write")
+    args = parser.parse_args()
+
+    runner = BatchRunner(get_venue(args.venue))
+    source = sys.stdin if args.operations == "-" else open(args.operations, "r")
+    output = sys.stdout if args.out == "-" else open(args.out, "w")
+    with source, output:
+        total, failed = runner.run(source, output, max(1, args.group_size))
+    print(f"{total} operations, {failed} failed.", file=sys.stderr)
@@ -0,0 +1,7 @@
+# benchmarks/__init__.py
+#
+# Benchmark suite for the court booking system.
+#   python -m benchmarks.generate --rows 100000 --out /tmp/bench-data   # synthetic data files
+#   python -m benchmarks.run --sizes 1000 10000 100000 --output results.json
+#   python -m benchmarks.run --compare results.json                     # flag regressions
+#   python -m benchmarks.memory --sizes 1000000                         # namedtuples vs BookingColumns
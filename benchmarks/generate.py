@@ -0,0 +1,118 @@
+# benchmarks/generate.py
+
+import os
+import csv
+import random
+import argparse
+from availability_grid import COURTS, DAY_NAMES
+from storage import BOOKING_FIELDS
+from time_slots import SLOTS
+
+# Default distributions: evenings and weekends are busier, most history is canceled
+DEFAULT_STATUS_WEIGHTS = {"active": 0.2, "canceled": 0.8}
+DEFAULT_DAY_WEIGHTS = [1.0, 1.0, 1.0, 1.1, 1.3, 1.8, 1.6]
+DEFAULT_DURATIONS = [0.5, 1, 1.5, 2]
+DEFAULT_DURATION_WEIGHTS = [0.1, 0.5, 0.25, 0.15]
+
+
+def peak_slot_weights(peak_start="05:00 PM", peak_end="09:00 PM", peak_factor=3.0):
+    """Weight each start slot, favouring the evening peak."""
+    first, last = SLOTS.boundary_index(peak_start), SLOTS.boundary_index(peak_end)
+    return [peak_factor if first <= i < last else 1.0 for i in range(SLOTS.count)]  # 10. List Comprehensions
+
+
+def user_names(count):
+    """Return `count` synthetic usernames."""
+    return [f"User{i:06d}" for i in range(1, count + 1)]
+
+
+def generate_bookings(path, rows, user_count=1000, courts=COURTS, status_weights=None, day_weights=None,
+                      slot_weights=None, durations=None, duration_weights=None, user_skew=1.2, seed=42):
+    """
+    Write `rows` synthetic bookings to a bookings.csv file.
+    Active bookings never overlap on a (court, day); once a slot is taken the row is written as canceled,
+    which mirrors a real history where most rows are old or canceled.
+    """
+    rng = random.Random(seed)
+    status_weights = status_weights or DEFAULT_STATUS_WEIGHTS
+    day_weights = day_weights or DEFAULT_DAY_WEIGHTS
+    slot_weights = slot_weights or peak_slot_weights()
+    durations = durations or DEFAULT_DURATIONS
+    duration_weights = duration_weights or DEFAULT_DURATION_WEIGHTS
+    names = user_names(user_count)
+    # Zipf-like popularity: a few regulars make most bookings
+    user_weights = [1 / (rank ** user_skew) for rank in range(1, user_count + 1)]
+    statuses, status_probs = list(status_weights), list(status_weights.values())
+    taken = {}  # (court, day) -> bitmask of active slots
+
+    batch = 10000
+    with open(path, "w", newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(BOOKING_FIELDS)
+        for first in range(0, rows, batch):
+            count = min(batch, rows - first)
+            court_ids = rng.choices(courts, k=count)
+            days = rng.choices(DAY_NAMES, weights=day_weights, k=count)
+            starts = rng.choices(range(SLOTS.count), weights=slot_weights, k=count)
+            lengths = rng.choices(durations, weights=duration_weights, k=count)
+            chosen_users = rng.choices(names, weights=user_weights, k=count)
+            chosen_statuses = rng.choices(statuses, weights=status_probs, k=count)
+            for i in range(count):
+                duration = lengths[i]
+                start = min(starts[i], SLOTS.count - SLOTS.duration_slots(duration))
+                end = start + SLOTS.duration_slots(duration)
+                status = chosen_statuses[i]
+                if status == "active":
+                    key = (court_ids[i], days[i])
+                    run = ((1 << (end - start)) - 1) << start
+                    if taken.get(key, 0) & run:
+                        status = "canceled"
+                    else:
+                        taken[key] = taken.get(key, 0) | run
+                writer.writerow([
+                    first + i + 1, court_ids[i], days[i], SLOTS.boundaries[start], SLOTS.boundaries[end],
+                    SLOTS.format_duration(duration), status, chosen_users[i]
+                ])
+
+
+def generate_users(path, user_count):
+    """Write a users.csv file matching the generated usernames."""
+    with open(path, "w", newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["username", "password"])
+        writer.writerows([name, f"pw{i}"] for i, name in enumerate(user_names(user_count), 1))
+
+
+def generate_dataset(directory, rows, user_count=1000, seed=42, **options):
+    """Generate bookings.csv and users.csv in a directory. Returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    bookings_path = os.path.join(directory, "bookings.csv")
+    users_path = os.path.join(directory, "users.csv")
+    generate_bookings(bookings_path, rows, user_count=user_count, seed=seed, **options)
+    generate_users(users_path, user_count)
+    return bookings_path, users_path
+
+
+def parse_weights(text):
+    """Parse 'name=weight,name=weight' into a dictionary."""
+    return {name: float(weight) for name, weight in (item.split("=") for item in text.split(","))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic bookings.csv / users.csv files.")
+    parser.add_argument("--rows", type=int, default=10000, help="number of booking rows")
+    parser.add_argument("--users", type=int, default=1000, help="number of distinct users")
+    parser.add_argument("--out", default="bench-data", help="output directory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--courts", default=",".join(COURTS), help="comma-separated court IDs")
+    parser.add_argument("--statuses", default=None, help="status weights, e.g. active=0.2,canceled=0.8")
+    parser.add_argument("--days", default=None, help="seven comma-separated weekday weights (Monday first)")
+    parser.add_argument("--user-skew", type=float, default=1.2, help="Zipf exponent of user popularity")
+    args = parser.parse_args()
+    paths = generate_dataset(
+        args.out, args.rows, user_count=args.users, seed=args.seed, courts=args.courts.split(","),
+        status_weights=parse_weights(args.statuses) if args.statuses else None,
+        day_weights=[float(w) for w in args.days.split(",")] if args.days else None,
+        user_skew=args.user_skew
+    )
+    print(f"Wrote {args.rows} bookings and {args.users} users to {', '.join(paths)}")
@@ -0,0 +1,44 @@
+# benchmarks/memory.py
+
+import os
+import json
+import argparse
+import tempfile
+import tracemalloc
+from booking_columns import BookingColumns
+from storage import iter_bookings
+from benchmarks.generate import generate_bookings
+
+DEFAULT_SIZES = [100000, 1000000]
+
+
+def measure(path, container):
+    """Return the bytes still allocated after loading the file into `container`."""
+    tracemalloc.start()
+    bookings = container(iter_bookings(path))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del bookings
+    return size
+
+
+def compare_representations(rows, seed=42):
+    """Generate `rows` bookings and measure them as a list of namedtuples and as BookingColumns."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bookings.csv")
+        generate_bookings(path, rows, seed=seed)
+        tuples = measure(path, list)
+        columns = measure(path, BookingColumns)
+    return {
+        "tuples_bytes": tuples,
+        "columns_bytes": columns,
+        "bytes_per_booking": {"tuples": round(tuples / rows, 1), "columns": round(columns / rows, 1)},
+        "reduction": round(tuples / columns, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory of namedtuple and columnar booking storage.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="booking rows per dataset")
+    args = parser.parse_args()
+    print(json.dumps({str(rows): compare_representations(rows) for rows in args.sizes}, indent=2))
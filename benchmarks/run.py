@@ -0,0 +1,156 @@
+# benchmarks/run.py
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+from contextlib import redirect_stdout
+from bookings import Bookings
+from filter_courts import CourtFilter
+from availability_grid import COURTS, DAY_NAMES
+from availability_search import find_alternative_slots
+from storage import CsvBookingStore, SqliteBookingStore, migrate_csv_to_sqlite
+from time_slots import SLOTS
+from benchmarks.generate import generate_dataset
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# An operation is flagged when it is this many times slower than the baseline
+DEFAULT_THRESHOLD = 1.25
+
+
+def timed(fn, calls=1):
+    """Run fn() `calls` times and return the mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def summarize(samples):
+    """Summarize repeated per-call timings (seconds) as microseconds."""
+    return {
+        "min_us": round(min(samples) * 1e6, 3),
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "repeats": len(samples),
+    }
+
+
+def open_bookings(bookings_path, backend, db_path):
+    """Load Bookings from the generated files with the chosen backend."""
+    if backend == "sqlite":
+        return Bookings(bookings_path, store=SqliteBookingStore(db_path))
+    return Bookings(bookings_path, store=CsvBookingStore(bookings_path))
+
+
+def benchmark_size(rows, backend="csv", repeats=5, calls=200, seed=42):
+    """Generate a dataset of `rows` bookings and time the key operations on it."""
+    rng = random.Random(seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        bookings_path, users_path = generate_dataset(directory, rows, seed=seed)
+        db_path = os.path.join(directory, "bench.db")
+        if backend == "sqlite":
+            migrate_csv_to_sqlite(bookings_path, users_path, db_path, SLOTS.to_minutes)
+
+        # Booking methods print their outcome; keep that out of the timings' output
+        with redirect_stdout(io.StringIO()):
+            results["load_bookings"] = summarize([
+                timed(lambda: open_bookings(bookings_path, backend, db_path)) for _ in range(repeats)])
+
+            bookings = open_bookings(bookings_path, backend, db_path)
+            court_filter = CourtFilter()
+            all_bookings = bookings.bookings
+            results["synchronize_with_bookings"] = summarize([
+                timed(lambda: CourtFilter().synchronize_with_bookings(all_bookings)) for _ in range(repeats)])
+            court_filter.synchronize_with_bookings(bookings.active_bookings())
+
+            searches = [(rng.randrange(7), rng.choice(SLOTS.times), rng.choice(COURTS), rng.choice([1, 1.5, 2]))
+                        for _ in range(calls)]
+            results["availability_search"] = summarize([
+                timed(lambda: [find_alternative_slots(court_filter, *search) for search in searches]) / calls
+                for _ in range(repeats)])
+
+            creates = iter([(rng.choice(COURTS), rng.choice(DAY_NAMES), rng.randrange(SLOTS.count))
+                            for _ in range(calls * repeats)])
+
+            def create_one():
+                court_id, day, start = next(creates)
+                bookings.create_booking(court_id, day, SLOTS.times[start], SLOTS.boundaries[start + 1], 0.5, "Bench")
+
+            results["create_booking"] = summarize([timed(create_one, calls) for _ in range(repeats)])
+
+            active = [(b.booking_id, b.username) for b in bookings.active_bookings() if b.username]
+            rng.shuffle(active)
+            cancels = iter(active)
+
+            def cancel_one():
+                booking_id, username = next(cancels, (0, "Nobody"))
+                bookings.cancel_user_booking(booking_id, username)
+
+            cancel_calls = max(1, min(calls, len(active) // repeats))
+            results["cancel_user_booking"] = summarize([timed(cancel_one, cancel_calls) for _ in range(repeats)])
+    return results
+
+
+def run(sizes, backend="csv", repeats=5, calls=200):
+    """Benchmark every size and return the machine-readable report."""
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend,
+            "repeats": repeats,
+            "calls": calls,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for rows in sizes:
+        print(f"Benchmarking {rows} rows...", file=sys.stderr)
+        report["results"][str(rows)] = benchmark_size(rows, backend, repeats, calls)
+    return report
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return the (size, operation, baseline_us, current_us) entries that regressed past the threshold."""
+    regressions = []
+    for size, operations in report["results"].items():
+        for operation, stats in operations.items():
+            previous = baseline.get("results", {}).get(size, {}).get(operation)
+            if previous and stats["median_us"] > previous["median_us"] * threshold:
+                regressions.append((size, operation, previous["median_us"], stats["median_us"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the booking system's hot paths at several history sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="booking rows per dataset (up to 10^7)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=200, help="calls per repeat for per-call operations")
+    parser.add_argument("--output", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored JSON report")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.backend, args.repeats, args.calls)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        for size, operation, before, after in regressions:
+            print(f"REGRESSION {operation} @ {size} rows: {before:.1f}us -> {after:.1f}us ({after / before:.2f}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions.", file=sys.stderr)
@@ -0,0 +1,101 @@
+# booking_columns.py
+
+from array import array
+from collections.abc import MutableSequence
+from storage import Booking
+from time_slots import SLOTS
+
+
+class InternTable:
+    def __init__(self, values=()):
+        """Initialize a table mapping each distinct value to a small integer code."""
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        """Return the code of a value, adding it to the table on first sight."""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# 1. Separating Functions and Data:
+# Bookings are kept as parallel typed arrays instead of one namedtuple per row. Court, day, status,
+# duration and user are stored as intern-table codes; times are slot indexes (the time table is seeded
+# with the slot boundaries, so an on-grid time's code is its index and off-grid legacy times still
+# round-trip). One booking costs 24 bytes of columns instead of a tuple plus seven strings.
+# Reading an element builds a Booking, so callers written for a list of Booking work unchanged.
+class BookingColumns(MutableSequence):
+    def __init__(self, bookings=(), slots=SLOTS):
+        """Initialize the columns for a venue's slot table, streaming in any given bookings."""
+        self.booking_ids = array('q')
+        self.court_codes = array('H')
+        self.day_codes = array('H')
+        self.start_slots = array('H')
+        self.end_slots = array('H')
+        self.duration_codes = array('H')
+        self.status_codes = array('H')
+        self.user_codes = array('I')
+        self.courts = InternTable()
+        self.days = InternTable()
+        self.times = InternTable(slots.boundaries)
+        self.durations = InternTable()
+        self.statuses = InternTable(['active'])
+        self.users = InternTable([None])
+        self.columns = [self.booking_ids, self.court_codes, self.day_codes, self.start_slots,
+                        self.end_slots, self.duration_codes, self.status_codes, self.user_codes]
+        self.extend(bookings)
+
+    def encode(self, booking):
+        """Return the column values of a booking, in column order."""
+        return (booking.booking_id, self.courts.code(booking.court_id), self.days.code(booking.day),
+                self.times.code(booking.start_time), self.times.code(booking.end_time),
+                self.durations.code(booking.duration), self.statuses.code(booking.status),
+                self.users.code(booking.username))
+
+    def __len__(self):
+        return len(self.booking_ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return Booking(
+            booking_id=self.booking_ids[position],
+            court_id=self.courts[self.court_codes[position]],
+            day=self.days[self.day_codes[position]],
+            start_time=self.times[self.start_slots[position]],
+            end_time=self.times[self.end_slots[position]],
+            duration=self.durations[self.duration_codes[position]],
+            status=self.statuses[self.status_codes[position]],
+            username=self.users[self.user_codes[position]]
+        )
+
+    def __setitem__(self, position, booking):
+        for column, value in zip(self.columns, self.encode(booking)):
+            column[position] = value
+
+    def __delitem__(self, position):
+        for column in self.columns:
+            del column[position]
+
+    def insert(self, position, booking):
+        for column, value in zip(self.columns, self.encode(booking)):
+            column.insert(position, value)
+
+    def append(self, booking):
+        for column, value in zip(self.columns, self.encode(booking)):
+            column.append(value)
+
+    def nbytes(self):
+        """Return the bytes held by the column arrays."""
+        return sum(column.itemsize * len(column) for column in self.columns)
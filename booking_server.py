@@ -0,0 +1,401 @@
+# booking_server.py
+
+import json
+import math
+import asyncio
+import traceback
+import argparse
+import multiprocessing
+from bookings import Bookings
+from filter_courts import CourtFilter
+from startup_snapshot import open_booking_state
+from availability_search import cached_alternative_slots
+from config import SEARCH_WINDOW_HOURS, SEARCH_RESULT_LIMIT
+from time_slots import SLOTS
+from venues import get_venue, venue_names
+from waitlist import open_waitlist
+from credentials import verify_password
+import users
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Most availability results one request may ask for
+MAX_SEARCH_LIMIT = 100
+# Most queued writes the writer applies and persists with one store write (one journal fsync)
+MAX_WRITE_BATCH = 256
+
+
+class RequestError(Exception):
+    """A request that cannot be served; its message is sent back to the client."""
+
+
+def parse_day(value, court_filter):
+    """Accept a day number, a day name or (with calendar dates) a YYYY-MM-DD date; return (day_index, day)."""
+    day_names = court_filter.day_names
+    text = str(value if value is not None else "").strip()
+    if text.isdigit():
+        day_index = int(text) - 1 if 1 <= int(text) <= len(day_names) else None
+    else:
+        day_index = court_filter.get_day_index(text if court_filter.start_date else text.capitalize())
+    if day_index is None:
+        kind = "a YYYY-MM-DD date in the booking horizon" if court_filter.start_date else "a day name"
+        raise RequestError(f"Invalid day. Use 1-{len(day_names)} or {kind}.")
+    return day_index, day_names[day_index]
+
+
+def parse_time(value, slots=SLOTS):
+    """Normalize a time string to the HH:MM AM/PM form."""
+    time_str = slots.normalize(str(value or ""))
+    if time_str is None:
+        raise RequestError("Invalid time format. Use HH:MM AM/PM.")
+    return time_str
+
+
+def parse_duration(value, slots=SLOTS):
+    """Parse a duration in hours that is a whole number of slots."""
+    error = f"Invalid duration. Use hours in {slots.slot_minutes}-minute increments."
+    try:
+        duration_hours = float(value)
+    except (TypeError, ValueError):
+        raise RequestError(error)
+    if not math.isfinite(duration_hours) or slots.duration_slots(duration_hours) is None:
+        raise RequestError(error)
+    return duration_hours
+
+
+def parse_search_window(value, slots=SLOTS):
+    """Parse a search window in hours: positive, and at most the venue's opening hours."""
+    opening_hours = slots.count * slots.slot_minutes / 60
+    try:
+        window = float(value)
+    except (TypeError, ValueError):
+        window = None
+    if window is None or not math.isfinite(window) or window <= 0:
+        raise RequestError(f"Invalid search window. Use a positive number of hours up to {opening_hours:g}.")
+    return min(window, opening_hours)
+
+
+def parse_limit(value):
+    """Parse a result limit: a positive number of results, at most MAX_SEARCH_LIMIT."""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError, OverflowError):
+        limit = None
+    if limit is None or limit <= 0:
+        raise RequestError(f"Invalid limit. Use a whole number from 1 to {MAX_SEARCH_LIMIT}.")
+    return min(limit, MAX_SEARCH_LIMIT)
+
+
+# 1. Separating Functions and Data:
+# One process holds the Bookings and CourtFilter state in memory. Reads are answered straight
+# from that state on the event loop; every mutation goes through one writer task, so reads never
+# see a half-applied change and no locks are needed.
+#
+# Protocol: one JSON object per line in each direction. Requests carry "op" and an optional "id"
+# that is echoed back. Clients may pipeline; responses on a connection come back in request order.
+class BookingServer:
+    def __init__(self, bookings=None, court_filter=None, users_data=None, venue=None):
+        """Load (or adopt) the booking state of one venue the server will serve."""
+        if bookings is None and court_filter is None:
+            bookings, court_filter, _ = open_booking_state(venue=venue)
+        self.bookings = bookings or Bookings(venue=venue)
+        if court_filter is None:
+            court_filter = CourtFilter(venue=self.bookings.venue)
+            court_filter.synchronize_with_bookings(self.bookings.active_bookings())
+            self.bookings.subscribe(court_filter.apply_booking_event)
+        self.court_filter = court_filter
+        # Cancellations applied by the writer promote waiters through the waitlist's listener
+        self.waitlist = open_waitlist(self.bookings)
+        self.users_data = users.load_users() if users_data is None else users_data
+        self.write_queue = None
+        self.writer_task = None
+
+        # 6. Mapping: operation names are mapped to handler functions
+        self.read_handlers = {
+            "ping": self.handle_ping,
+            "login": self.handle_login,
+            "view": self.handle_view,
+            "availability": self.handle_availability,
+            "waitlist": self.handle_waitlist,
+            "stats": self.handle_stats,
+        }
+        self.write_handlers = {
+            "create": self.handle_create,
+            "cancel": self.handle_cancel,
+            "join_waitlist": self.handle_join_waitlist,
+            "leave_waitlist": self.handle_leave_waitlist,
+        }
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start the writer task and begin accepting connections."""
+        self.write_queue = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self.run_writer())
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def run_writer(self):
+        """
+        Apply queued mutations in order (the single writer). Whatever has queued up meanwhile is applied
+        as one batch and persisted with one store write; its responses are sent once that write is done.
+        """
+        while True:
+            batch = [await self.write_queue.get()]
+            while len(batch) < MAX_WRITE_BATCH and not self.write_queue.empty():
+                batch.append(self.write_queue.get_nowait())
+            batch = [write for write in batch if not write[3].cancelled()]
+            try:
+                with self.bookings.grouped_writes():
+                    responses = [self.apply_write(handler, request, username) for handler, request, username, _ in batch]
+            except Exception:
+                # The batch could not be persisted, so none of it is acknowledged
+                traceback.print_exc()
+                responses = [{"id": request.get("id"), "ok": False, "error": "Internal server error."}
+                             for _, request, _, _ in batch]
+            for (_, _, _, future), response in zip(batch, responses):
+                if not future.cancelled():
+                    future.set_result(response)
+
+    def apply_write(self, handler, request, username):
+        """Apply one queued mutation, turning an unexpected error into a failed response."""
+        try:
+            return self.dispatch(handler, request, username)
+        except Exception:
+            # A bug in one handler must not stop the writer: later writes would never be applied
+            traceback.print_exc()
+            return {"id": request.get("id"), "ok": False, "error": "Internal server error."}
+
+    def dispatch(self, handler, request, context):
+        """Run a handler and wrap its result or error in a response."""
+        response = {"id": request.get("id")}
+        try:
+            response.update(ok=True, **handler(request, context))
+        except RequestError as error:
+            response.update(ok=False, error=str(error))
+        return response
+
+    def submit(self, request, session):
+        """Return a future for the response to one request."""
+        loop = asyncio.get_running_loop()
+        op = request.get("op")
+        if op == "login":
+            return asyncio.ensure_future(self.login(request, session))
+        if op in self.write_handlers:
+            future = loop.create_future()
+            # Writes capture the username now, so a later login on the same connection cannot change it
+            self.write_queue.put_nowait((self.write_handlers[op], request, session["username"], future))
+            session["last_write"] = future
+            return future
+        if op in self.read_handlers:
+            last_write = session.get("last_write")
+            if last_write is not None and not last_write.done():
+                # Read-your-writes: wait for this connection's pending write first
+                return asyncio.ensure_future(self.read_after(last_write, self.read_handlers[op], request, session))
+            future = loop.create_future()
+            future.set_result(self.dispatch(self.read_handlers[op], request, session))
+            return future
+        future = loop.create_future()
+        future.set_result({"id": request.get("id"), "ok": False, "error": f"Unknown operation: {op}"})
+        return future
+
+    async def login(self, request, session):
+        """Serve a login, deriving the password hash in a worker thread so other connections are served meanwhile."""
+        username = str(request.get("username", "")).strip().upper()
+        password = str(request.get("password", ""))
+        stored = self.users_data.get(username)  # User stores are read on the event loop only
+        verified = stored is not None and users.sessions.cached(username, stored, password)
+        if stored is not None and not verified:
+            verified = await asyncio.get_running_loop().run_in_executor(None, verify_password, stored, password)
+            if verified:
+                users.sessions.remember(username, stored, password)
+        if not verified:
+            return {"id": request.get("id"), "ok": False, "error": "Invalid username or password."}
+        session["username"] = username
+        return {"id": request.get("id"), "ok": True, "username": username}
+
+    async def read_after(self, pending, handler, request, session):
+        """Serve a read once an earlier write from the same connection has been applied."""
+        await pending
+        return self.dispatch(handler, request, session)
+
+    async def handle_connection(self, reader, writer):
+        """Read pipelined requests and queue their responses in order."""
+        session = {"username": None, "last_write": None}
+        responses = asyncio.Queue()
+        responder = asyncio.create_task(self.send_responses(responses, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result({"id": None, "ok": False, "error": "Invalid JSON request."})
+                    responses.put_nowait(future)
+                    continue
+                future = self.submit(request, session)
+                responses.put_nowait(future)
+                if request.get("op") == "login":
+                    await asyncio.wait([future])  # Later requests on this connection act as the logged-in user
+        except ConnectionError:
+            pass
+        finally:
+            responses.put_nowait(None)
+            await responder
+            writer.close()
+
+    async def send_responses(self, responses, writer):
+        """Write responses in request order, draining once per burst rather than per response."""
+        while True:
+            future = await responses.get()
+            if future is None:
+                break
+            response = await future
+            try:
+                writer.write((json.dumps(response) + "\n").encode())
+                if responses.empty():
+                    await writer.drain()
+            except ConnectionError:
+                break
+
+    def require_user(self, username):
+        """Raise unless the connection is logged in."""
+        if not username:
+            raise RequestError("Please log in first.")
+        return username
+
+    # Read handlers receive the connection's session dictionary
+    def handle_ping(self, request, session):
+        return {}
+
+    def handle_login(self, request, session):
+        username = users.authenticate(self.users_data, str(request.get("username", "")), str(request.get("password", "")))
+        if username is None:
+            raise RequestError("Invalid username or password.")
+        session["username"] = username
+        return {"username": username}
+
+    def handle_view(self, request, session):
+        username = self.require_user(session["username"])
+        return {"bookings": [booking._asdict() for booking in self.bookings.find_user_bookings(username)]}
+
+    def handle_availability(self, request, session):
+        day_index, _ = parse_day(request.get("day"), self.court_filter)
+        court_id = str(request.get("court", "")).strip().upper()
+        if court_id not in self.court_filter.grid.court_index:
+            raise RequestError(f"Invalid court ID. Please choose between {self.court_filter.venue.court_label}.")
+        results = cached_alternative_slots(
+            self.court_filter, day_index, parse_time(request.get("time"), self.court_filter.slots), court_id,
+            parse_duration(request.get("duration"), self.court_filter.slots),
+            parse_search_window(request.get("window", SEARCH_WINDOW_HOURS), self.court_filter.slots),
+            parse_limit(request.get("limit", SEARCH_RESULT_LIMIT))
+        )
+        return {"results": results}
+
+    def handle_stats(self, request, session):
+        return {"availability_cache": self.court_filter.search_cache.stats()}
+
+    def handle_waitlist(self, request, session):
+        username = self.require_user(session["username"])
+        return {"entries": [entry._asdict() for entry in self.waitlist.user_entries(username)]}
+
+    # Write handlers receive the username captured when the request was queued
+    def handle_create(self, request, username):
+        self.require_user(username)
+        _, day_name = parse_day(request.get("day"), self.court_filter)
+        start_time = parse_time(request.get("start_time"), self.court_filter.slots)
+        duration_hours = parse_duration(request.get("duration"), self.court_filter.slots)
+        end_time = self.court_filter.slots.end_time(start_time, duration_hours)
+        if end_time is None:
+            raise RequestError("The booking runs outside of operating hours.")
+        booking, error = self.bookings.try_create_booking(
+            str(request.get("court", "")), day_name, start_time, end_time, duration_hours, username)
+        if error:
+            raise RequestError(error)
+        return {"booking": booking._asdict()}
+
+    def handle_cancel(self, request, username):
+        self.require_user(username)
+        try:
+            booking_id = int(request.get("booking_id"))
+        except (TypeError, ValueError):
+            raise RequestError("Invalid booking ID.")
+        booking, error = self.bookings.try_cancel_booking(booking_id, username)
+        if error:
+            raise RequestError(error)
+        return {"booking": booking._asdict()}
+
+    def handle_join_waitlist(self, request, username):
+        self.require_user(username)
+        _, day_name = parse_day(request.get("day"), self.court_filter)
+        slots = self.court_filter.slots
+        entry, error = self.waitlist.try_join(
+            username, str(request.get("court", "ANY")), day_name, parse_time(request.get("start_time"), slots),
+            parse_time(request.get("end_time"), slots), parse_duration(request.get("duration"), slots))
+        if error:
+            raise RequestError(error)
+        return {"entry": entry._asdict()}
+
+    def handle_leave_waitlist(self, request, username):
+        self.require_user(username)
+        try:
+            entry_id = int(request.get("entry_id"))
+        except (TypeError, ValueError):
+            raise RequestError("Invalid waitlist entry ID.")
+        entry, error = self.waitlist.try_withdraw(entry_id, username)
+        if error:
+            raise RequestError(error)
+        return {"entry": entry._asdict()}
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, venue_name=None):
+    """Run a booking server for one venue until cancelled."""
+    venue = get_venue(venue_name)
+    booking_server = BookingServer(venue=venue)
+    server = await booking_server.start(host, port)
+    print(f"Court booking server for venue {venue.name} listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def run_worker(host, port, venue_name):
+    """Entry point of a worker process serving one venue."""
+    try:
+        asyncio.run(serve(host, port, venue_name))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_venues(host=DEFAULT_HOST, base_port=DEFAULT_PORT, names=None):
+    """
+    Serve each venue from its own worker process, on consecutive ports from base_port.
+    Venues share no booking state, so each process loads and serves only its own shard.
+    """
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(host, base_port + i, name), name=f"venue-{name}")
+        for i, name in enumerate(names or venue_names())
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the court booking system as JSON lines over TCP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (the first port with --all-venues)")
+    parser.add_argument("--venue", default=None, help="venue to serve (default: the default venue)")
+    parser.add_argument("--all-venues", action="store_true", help="serve every venue, one worker process each")
+    args = parser.parse_args()
+    try:
+        if args.all_venues:
+            serve_venues(args.host, args.port)
+        else:
+            asyncio.run(serve(args.host, args.port, args.venue))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
@@ -1,72 +1,191 @@
 # bookings.py
 
-import os
-import csv
+from functools import partial
 from collections import namedtuple
-from functools import reduce
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from interval_index import IntervalIndex
+from booking_columns import BookingColumns
+from storage import Booking, create_booking_store
+from time_slots import SLOTS
+from venues import get_venue
+from calendar_days import is_bookable_date
+import instrumentation
+import config
 
 # File path to store bookings
 BOOKINGS_FILE_PATH = "data/bookings.csv"
 
-# Define the Booking namedtuple with end_time
-Booking = namedtuple('Booking', ['booking_id', 'court_id', 'day', 'start_time', 'end_time', 'duration', 'status', 'username'])
+# A booking request as accepted by create_bookings_bulk
+BookingRequest = namedtuple('BookingRequest', ['court_id', 'day', 'start_time', 'end_time', 'duration_hours'])
 
 # 1. Separating Functions and Data:
 # The bookings data is stored separately from the functions that manipulate this data.
+# Persistence is delegated to a booking store (CSV snapshot + journal, or SQLite).
 class Bookings:
-    def __init__(self, file_path=BOOKINGS_FILE_PATH):
-        """Initialize the Bookings class with the given file path."""
-        self.file_path = file_path
-        self.bookings = self.load_bookings()  # 1. Separating functions and data
+    def __init__(self, file_path=None, journal_mode=True, store=None, compact=None, state=None, venue=None):
+        """Initialize the Bookings class with the given file path or booking store (or a saved snapshot state)."""
+        # Each venue's bookings are a separate shard with its own courts, slots and data files
+        self.venue = venue or get_venue()
+        self.slots = self.venue.slots
+        self.file_path = file_path or self.venue.bookings_path
+        self.store = store or create_booking_store(self.file_path, journal_mode, db_path=self.venue.sqlite_path)
+        # Compact mode keeps bookings in typed columns (BookingColumns) rather than a list of namedtuples
+        self.compact = config.COMPACT_BOOKINGS if compact is None else compact
+        self.listeners = []  # Called as listener(event, booking) on 'create' and 'cancel'
+        self.after_emit = []  # Work queued by listeners, run once every listener has seen the event
+        self.reload(state)
 
+    def reload(self, state=None):
+        """(Re)load bookings and indexes from the store (or a snapshot state) and remember the source signature."""
+        if state is not None:
+            self.restore_state(state)
+            return
+        self.loaded_signature = self.store.signature()
+        self._bookings = None
+        self.interval_index = None
+        self.positions = {}           # booking_id -> position in self.bookings
+        self.user_booking_ids = {}    # lowercased username -> booking_ids, oldest first
+        self.max_booking_id = 0
+        if not self.store.indexed:
+            # Indexed stores answer queries directly, so nothing is loaded up front
+            self._bookings = self.load_bookings()  # 1. Separating functions and data
+            self.build_indexes()
+
+    def snapshot_state(self):
+        """Return the loaded bookings, indexes and store state, as saved by the startup snapshot."""
+        return {
+            "signature": self.loaded_signature,
+            "bookings": self._bookings,
+            "interval_index": self.interval_index,
+            "positions": self.positions,
+            "user_booking_ids": self.user_booking_ids,
+            "max_booking_id": self.max_booking_id,
+            "store": self.store.snapshot_state(),
+        }
+
+    def restore_state(self, state):
+        """Adopt a state saved by snapshot_state() instead of parsing the data files."""
+        self.loaded_signature = state["signature"]
+        self._bookings = state["bookings"]
+        self.interval_index = state["interval_index"]
+        self.positions = state["positions"]
+        self.user_booking_ids = state["user_booking_ids"]
+        self.max_booking_id = state["max_booking_id"]
+        self.store.restore_state(state["store"])
+
+    def build_indexes(self):
+        """Rebuild the interval index and the booking_id / username lookups from self.bookings."""
+        self.interval_index = self.build_interval_index()
+        self.positions = {}
+        self.user_booking_ids = {}
+        # The persisted counter keeps IDs unique even if old bookings were moved out of the file
+        self.max_booking_id = max(self.max_booking_id, self.store.load_max_booking_id())
+        for position, booking in enumerate(self._bookings):
+            self.index_lookup(position, booking)
+
+    def reload_if_changed(self):
+        """Reload only if the underlying files changed since they were last read or written here."""
+        if self.store.signature() == self.loaded_signature:
+            return False
+        self.reload()
+        return True
+
+    @contextmanager
+    def grouped_writes(self):
+        """
+        Persist every create and cancel made inside the block with one store write at its end.
+        Changes are applied (and visible) in memory at once; a crash inside the block loses the whole group.
+        """
+        with self.store.grouped():
+            yield
+        self.loaded_signature = self.store.signature()
+
+    def subscribe(self, listener):
+        """Register a function called as listener(event, booking) after each create or cancel."""
+        self.listeners.append(listener)
+
+    def emit(self, event, booking):
+        """Notify listeners of a change and record the store's new signature."""
+        self.loaded_signature = self.store.signature()
+        # 4. Passing Functions as Arguments: listeners are plain callables
+        for listener in self.listeners:
+            listener(event, booking)
+        while self.after_emit:
+            self.after_emit.pop(0)()
+
+    def call_after_emit(self, callback):
+        """
+        Run callback() once the event being delivered has reached every listener. Listeners that change
+        bookings use this, so no listener sees the resulting events before the one that caused them.
+        """
+        self.after_emit.append(callback)
+
+    @property
+    def bookings(self):
+        """All bookings; loaded on first use when the store is indexed."""
+        if self._bookings is None:
+            self._bookings = self.load_bookings()
+        return self._bookings
+
+    @bookings.setter
+    def bookings(self, bookings):
+        self._bookings = bookings
+        if not self.store.indexed:
+            self.build_indexes()
+
+    @instrumentation.instrument("load_bookings")
     def load_bookings(self):
-        """Load bookings from the bookings.csv file."""
-        bookings = []
-        if os.path.exists(self.file_path):
-            with open(self.file_path, "r", newline='') as file:
-                reader = csv.DictReader(file)
-                # 7. Filtering: Only valid and complete booking entries are loaded
-                bookings = [
-                    Booking(
-                        booking_id=int(row['booking_id']),
-                        court_id=row['court_id'].strip().upper(),
-                        day=row['day'].strip().capitalize(),
-                        start_time=row['start_time'].strip().upper(),
-                        end_time=row['end_time'].strip().upper(),
-                        duration=row['duration'].strip(),
-                        status=row['status'].strip().lower(),
-                        username=row['username'].strip().capitalize() if row['username'].strip() else None
-                    )
-                    for row in reader
-                    if row['booking_id'].strip() and row['court_id'].strip() and row['day'].strip()
-                       and row['start_time'].strip() and row['end_time'].strip()
-                ]  # 10. List Comprehensions
+        """Load bookings from the booking store."""
+        bookings = self.store.load(partial(BookingColumns, slots=self.slots) if self.compact else list)
+        if instrumentation.ENABLED:
+            instrumentation.count_rows("load_bookings", len(bookings))
         return bookings
 
+    def active_bookings(self):
+        """Return the active bookings (used to synchronize court availability)."""
+        if self.store.indexed:
+            return self.store.active_bookings()
+        # 7. Filtering: Only active bookings occupy the courts
+        return list(filter(lambda b: b.status == 'active', self.bookings))
+
+    def build_interval_index(self):
+        """Build the per-(court, day) interval index from the active bookings."""
+        index = IntervalIndex()
+        # 7. Filtering: Only active bookings occupy the courts
+        for booking in filter(lambda b: b.status == 'active', self.bookings):
+            self.index_booking(index, booking)
+        return index
+
+    def index_booking(self, index, booking):
+        """Add a booking's interval to the given index."""
+        index.add(booking.court_id, booking.day, self.time_to_minutes(booking.start_time),
+                  self.time_to_minutes(booking.end_time), booking.booking_id)
+
+    def index_lookup(self, position, booking):
+        """Add a booking to the booking_id and username lookups."""
+        duplicate = booking.booking_id in self.positions
+        self.positions[booking.booking_id] = position
+        if booking.username and not duplicate:
+            self.user_booking_ids.setdefault(booking.username.lower(), []).append(booking.booking_id)
+        self.max_booking_id = max(self.max_booking_id, booking.booking_id)
+
     def save_bookings(self):
-        """Save all bookings to the bookings.csv file."""
-        with open(self.file_path, "w", newline='') as file:
-            writer = csv.writer(file)
-            # Write the header
-            writer.writerow(['booking_id', 'court_id', 'day', 'start_time', 'end_time', 'duration', 'status', 'username'])
-            # Write each booking
-            for booking in self.bookings:
-                writer.writerow([
-                    booking.booking_id,
-                    booking.court_id,
-                    booking.day,
-                    booking.start_time,
-                    booking.end_time,
-                    booking.duration,
-                    booking.status,
-                    booking.username if booking.username else ""
-                ])  # 10. List Comprehensions
+        """Save all bookings to the booking store."""
+        if self.store.indexed:
+            return  # Indexed stores commit each change as it happens
+        self.store.save_all(self.bookings, self.max_booking_id)
+
+    def find_user_bookings(self, current_user):
+        """Return the active bookings of a user."""
+        if self.store.indexed:
+            return self.store.user_bookings(current_user)
+        # 7. Filtering: Only the user's own bookings are visited, via the username lookup
+        user_bookings = [self.bookings[self.positions[booking_id]] for booking_id in self.user_booking_ids.get(current_user.lower(), [])]
+        return [booking for booking in user_bookings if booking.status == 'active' and booking.username.lower() == current_user.lower()]
 
     def view_user_bookings(self, current_user):
         """Display active bookings for the current user."""
-        # 7. Filtering: Only active bookings for the current user are displayed
-        user_bookings = list(filter(lambda b: b.username and b.username.lower() == current_user.lower() and b.status == 'active', self.bookings))
+        user_bookings = self.find_user_bookings(current_user)
         if not user_bookings:
             print("No active bookings found for your account.")
         else:
@@ -76,85 +195,200 @@ class Bookings:
 
     def cancel_user_booking(self, booking_id, current_user):
         """Cancel a booking by booking_id for the current user."""
-        # 5. Returning functions: Check if the booking exists and is active
-        booking_exists = any(
-            booking.booking_id == booking_id and booking.status == 'active' and booking.username and booking.username.lower() == current_user.lower()
-            for booking in self.bookings
-        )
-        if not booking_exists:
-            print(f"Booking ID {booking_id} is either not active, does not exist, or does not belong to you.")
+        canceled, error = self.try_cancel_booking(booking_id, current_user)
+        if error:
+            print(error)
             return False
-
-        # 9. Lambdas: Update the booking status using a lambda function
-        self.bookings = list(map(
-            lambda booking: booking._replace(status="canceled") if booking.booking_id == booking_id and booking.username and booking.username.lower() == current_user.lower() else booking,
-            self.bookings
-        ))  # 10. List Comprehensions
         print(f"Booking ID {booking_id} has been canceled.")
-        self.save_bookings()  # 2. Assigning a function to a variable: save_bookings is called
         return True
 
-    def create_booking(self, court_id, day, start_time, end_time, duration_hours, current_user):
-        """Create a new booking for the current user."""
+    @instrumentation.instrument("cancel_user_booking")
+    def try_cancel_booking(self, booking_id, current_user):
+        """Cancel a user's booking without printing. Returns (canceled booking, None) or (None, error message)."""
+        not_found = f"Booking ID {booking_id} is either not active, does not exist, or does not belong to you."
+        if self.store.indexed:
+            booking = self.store.find_user_booking(booking_id, current_user)
+            if booking is None:
+                return None, not_found
+            self.store.set_status(booking_id, current_user, "canceled")
+            self._bookings = None
+            canceled = booking._replace(status="canceled")
+            self.emit('cancel', canceled)
+            return canceled, None
+
+        # 5. Returning functions: Look the booking up by ID and check it is active and owned by the user
+        position = self.positions.get(booking_id)
+        booking = self.bookings[position] if position is not None else None
+        if booking is None or booking.status != 'active' or not booking.username or booking.username.lower() != current_user.lower():
+            return None, not_found
+        if not self.store.can_change(booking.day):
+            # The date has moved on since the booking was loaded and its week is now closed
+            return None, f"Booking ID {booking_id} is in a past week and can no longer be changed."
+
+        self.interval_index.remove(booking.court_id, booking.day, self.time_to_minutes(booking.start_time),
+                                   self.time_to_minutes(booking.end_time), booking.booking_id)
+        canceled = booking._replace(status="canceled")
+        self.bookings[position] = canceled
+        self.store.record_status(booking_id, 'canceled', self.bookings, self.max_booking_id)
+        self.emit('cancel', canceled)
+        return canceled, None
+
+    def validate_booking(self, court_id, day, start_time, end_time, duration_hours):
+        """Return an error message if a booking request is invalid, or None (overlaps are checked separately)."""
         # Validate court_id
-        if court_id.upper() not in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-            print("Invalid court ID. Please choose between A-H.")
-            return False
+        if court_id.upper() not in self.venue.courts:
+            return f"Invalid court ID. Please choose between {self.venue.court_label}."
 
-        # Validate time format
-        try:
-            datetime.strptime(start_time.upper(), "%I:%M %p")
-            datetime.strptime(end_time.upper(), "%I:%M %p")
-        except ValueError:
-            print("Invalid time format. Please enter time in HH:MM AM/PM format.")
-            return False
+        # Validate times: both must fall on slot boundaries within opening hours
+        start_index = self.slots.slot_index(start_time.upper())
+        end_index = self.slots.boundary_index(end_time.upper())
+        if start_index is None or end_index is None or end_index <= start_index:
+            return f"Invalid time. Please enter HH:MM AM/PM times on the {self.slots.slot_minutes}-minute slots within opening hours."
 
-        # Validate day
+        # Validate day: a date inside the booking horizon with calendar dates, otherwise a weekday name
         valid_days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        if day.capitalize() not in valid_days:
-            print("Invalid day. Please enter a valid day of the week (Monday-Sunday).")
-            return False
+        if config.CALENDAR_DATES:
+            if not is_bookable_date(day):
+                return f"Invalid date. Please enter a YYYY-MM-DD date within the next {config.BOOKING_HORIZON_DAYS} days."
+        elif day.capitalize() not in valid_days:
+            return "Invalid day. Please enter a valid day of the week (Monday-Sunday)."
 
-        # Validate duration: must be positive and multiple of 0.5
-        if duration_hours <= 0 or (duration_hours * 2) != int(duration_hours * 2):
-            print("Invalid duration. Please enter a positive number in 30-minute increments (e.g., 1, 1.5, 2).")
-            return False
+        # Validate duration: must be positive, a whole number of slots and match the start and end time
+        duration_slots = self.slots.duration_slots(duration_hours)
+        if duration_slots is None:
+            return f"Invalid duration. Please enter a positive number of hours in {self.slots.slot_minutes}-minute increments."
+        if end_index - start_index != duration_slots:
+            return "Invalid duration. It does not match the start and end time."
+        return None
 
-        # Check for overlapping bookings using filtering and lambdas
-        overlapping = any(
-            set(self.calculate_time_slots(start_time, end_time)).intersection(set(self.calculate_time_slots(booking.start_time, booking.end_time)))
-            for booking in self.bookings if booking.court_id == court_id.upper() and booking.status == 'active'
+    def new_booking(self, booking_id, request, current_user):
+        """Build a normalized active Booking from a BookingRequest."""
+        return Booking(
+            booking_id=booking_id,
+            court_id=request.court_id.upper(),
+            day=request.day.capitalize(),
+            start_time=request.start_time.upper(),
+            end_time=request.end_time.upper(),
+            duration=self.slots.format_duration(request.duration_hours),
+            status="active",
+            username=current_user.capitalize()
         )
-        if overlapping:
-            print("Cannot create booking due to overlapping time slots.")
+
+    def create_booking(self, court_id, day, start_time, end_time, duration_hours, current_user):
+        """Create a new booking for the current user."""
+        new_booking, error = self.try_create_booking(court_id, day, start_time, end_time, duration_hours, current_user)
+        if error:
+            print(error)
             return False
+        print(f"Booking ID {new_booking.booking_id} has been created successfully.")
+        return True
+
+    @instrumentation.instrument("create_booking")
+    def try_create_booking(self, court_id, day, start_time, end_time, duration_hours, current_user):
+        """Create a booking without printing. Returns (new booking, None) or (None, error message)."""
+        error = self.validate_booking(court_id, day, start_time, end_time, duration_hours)
+        if error:
+            return None, error
 
-        # Assign a unique booking_id using reducing
-        new_booking_id = reduce(lambda acc, b: max(acc, b.booking_id), self.bookings, 0) + 1  # 8. Reducing
+        # Check for overlapping bookings on the same court and day through the interval index
+        if self.find_conflict(court_id.upper(), day.capitalize(), start_time.upper(), end_time.upper()) is not None:
+            return None, "Cannot create booking due to overlapping time slots."
+
+        new_booking_id = self.next_booking_id()
 
         # Create the new booking
-        new_booking = Booking(
-            booking_id=new_booking_id,
-            court_id=court_id.upper(),
-            day=day.capitalize(),
-            start_time=start_time.upper(),
-            end_time=end_time.upper(),
-            duration=f"{duration_hours} hour{'s' if duration_hours != 1 else ''}",
-            status="active",
-            username=current_user.capitalize()
-        )
-        self.bookings.append(new_booking)
-        self.save_bookings()
-        print(f"Booking ID {new_booking_id} has been created successfully.")
-        return True
+        new_booking = self.new_booking(
+            new_booking_id, BookingRequest(court_id, day, start_time, end_time, duration_hours), current_user)
+        self.add_booking(new_booking)
+        self.emit('create', new_booking)
+        return new_booking, None
+
+    def create_bookings_bulk(self, requests, current_user, usernames=None):
+        """
+        Create a batch of bookings for the current user (or for usernames[i], one per request), all or nothing.
+        Every request is validated against the existing bookings and the rest of the batch in one pass,
+        the batch gets a contiguous range of booking IDs and is persisted with a single write.
+        Returns the created bookings, or an empty list if any request was rejected.
+        """
+        requests = [BookingRequest(*request) for request in requests]  # 10. List Comprehensions
+        batch_index = IntervalIndex()
+        errors = []
+        for position, request in enumerate(requests, 1):
+            court_id, day = request.court_id.upper(), request.day.capitalize()
+            error = self.validate_booking(*request)
+            if error is None:
+                start_key, end_key = self.time_to_minutes(request.start_time.upper()), self.time_to_minutes(request.end_time.upper())
+                if self.find_conflict(court_id, day, request.start_time.upper(), request.end_time.upper()) is not None:
+                    error = "Cannot create booking due to overlapping time slots."
+                elif batch_index.find_conflict(court_id, day, start_key, end_key) is not None:
+                    error = "Overlaps another booking in the same batch."
+                else:
+                    batch_index.add(court_id, day, start_key, end_key, position)
+            if error:
+                errors.append((position, error))
+
+        if errors or not requests:
+            # 10. List Comprehensions: report every rejected request, nothing is written
+            [print(f"Request {position} ({requests[position - 1].court_id} {requests[position - 1].day} {requests[position - 1].start_time}): {error}") for position, error in errors]
+            return []
+
+        first_id = self.next_booking_id()
+        usernames = usernames or [current_user] * len(requests)
+        new_bookings = [self.new_booking(first_id + i, request, username)
+                        for i, (request, username) in enumerate(zip(requests, usernames))]
+        self.add_bookings(new_bookings)
+        print(f"Booking IDs {first_id}-{first_id + len(new_bookings) - 1} have been created successfully.")
+        for booking in new_bookings:
+            self.emit('create', booking)
+        return new_bookings
+
+    def recurring_booking_requests(self, court_id, days, start_time, duration_hours):
+        """Build the requests for a series booked at the same court and time on each of the given days."""
+        end_time = self.slots.end_time(start_time.upper(), duration_hours) or ""
+        return [BookingRequest(court_id, day, start_time, end_time, duration_hours) for day in days]
+
+    def create_recurring_booking(self, court_id, days, start_time, duration_hours, current_user):
+        """Book the same court and time on each of the given days as one all-or-nothing batch."""
+        return self.create_bookings_bulk(
+            self.recurring_booking_requests(court_id, days, start_time, duration_hours), current_user)
+
+    def find_conflict(self, court_id, day, start_time, end_time):
+        """Return the booking_id of an active booking overlapping the given slot range, or None."""
+        start_key, end_key = self.time_to_minutes(start_time), self.time_to_minutes(end_time)
+        if self.store.indexed:
+            return self.store.find_conflict(court_id, day, start_key, end_key)
+        return self.interval_index.find_conflict(court_id, day, start_key, end_key)
+
+    def next_booking_id(self):
+        """Return the next unused booking_id."""
+        if self.store.indexed:
+            return self.store.max_booking_id() + 1
+        return self.max_booking_id + 1
+
+    def add_booking(self, booking):
+        """Index and persist a newly created booking."""
+        self.add_bookings([booking])
+
+    def add_bookings(self, new_bookings):
+        """Index and persist newly created bookings with a single write."""
+        if self.store.indexed:
+            self.store.insert_all([
+                (booking, self.time_to_minutes(booking.start_time), self.time_to_minutes(booking.end_time))
+                for booking in new_bookings
+            ])
+            self._bookings = None
+            return
+        for booking in new_bookings:
+            self.bookings.append(booking)
+            self.index_booking(self.interval_index, booking)
+            self.index_lookup(len(self.bookings) - 1, booking)
+        self.store.record_creates(new_bookings, self.bookings, self.max_booking_id)
+
+    @staticmethod
+    def time_to_minutes(time_str):
+        """Convert an HH:MM AM/PM time string to minutes since midnight."""
+        return SLOTS.to_minutes(time_str)
 
     def calculate_time_slots(self, start_time, end_time):
         """Calculate all 30-minute time slots between start_time and end_time."""
-        start_dt = datetime.strptime(start_time, "%I:%M %p")
-        end_dt = datetime.strptime(end_time, "%I:%M %p")
-        slots = []
-        while start_dt < end_dt:
-            slot_time = start_dt.strftime("%I:%M %p")
-            slots.append(slot_time)
-            start_dt += timedelta(minutes=30)
-        return slots
+        return self.slots.slots_between(start_time, end_time)
@@ -0,0 +1,64 @@
+# calendar_days.py
+#
+# Calendar-date bookings (config.CALENDAR_DATES): Booking.day holds an ISO date (YYYY-MM-DD) instead of a
+# weekday name. Only dates inside the rolling horizon (today + BOOKING_HORIZON_DAYS - 1) can be booked,
+# and bookings are stored in one partition per ISO week, named like 2026-W42.
+
+from datetime import date, timedelta
+from config import BOOKING_HORIZON_DAYS
+from availability_grid import DAY_INDEX
+
+
+def parse_date(text):
+    """Parse a YYYY-MM-DD date, returning None if the text is not one."""
+    try:
+        return date.fromisoformat(str(text).strip())
+    except ValueError:
+        return None
+
+
+def week_key(day_date):
+    """Return the ISO week partition key (e.g. 2026-W42) of a date."""
+    year, week, _ = day_date.isocalendar()
+    return f"{year:04d}-W{week:02d}"
+
+
+def booking_week_key(day):
+    """Return the partition key of a booking's day, or None for undated (weekday name) bookings."""
+    day_date = parse_date(day)
+    return week_key(day_date) if day_date else None
+
+
+def horizon_dates(today=None, days=None):
+    """Return the bookable dates, today first."""
+    today = today or date.today()
+    return [today + timedelta(days=offset) for offset in range(days or BOOKING_HORIZON_DAYS)]
+
+
+def horizon_weeks(today=None, days=None):
+    """Return the partition keys the horizon touches, oldest first."""
+    return sorted({week_key(day_date) for day_date in horizon_dates(today, days)})
+
+
+def is_bookable_date(text, today=None):
+    """Check whether a YYYY-MM-DD date falls inside the booking horizon."""
+    day_date = parse_date(text)
+    dates = horizon_dates(today)
+    return day_date is not None and dates[0] <= day_date <= dates[-1]
+
+
+def weeks_between(start, end):
+    """Return the partition keys of every ISO week from start to end (dates, inclusive)."""
+    monday = start - timedelta(days=start.weekday())
+    keys = []
+    while monday <= end:
+        keys.append(week_key(monday))
+        monday += timedelta(days=7)
+    return keys
+
+
+def date_in_week(day_name, today=None):
+    """Return the ISO date of a weekday name within today's ISO week (used to date legacy bookings)."""
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+    return (monday + timedelta(days=DAY_INDEX[day_name])).isoformat()
@@ -1,6 +1,55 @@
 # config.py
 
-# List of valid 30-minute time slots from 08:00 AM to 09:30 PM
+# Storage backend for bookings and users: "csv" (snapshot + journal) or "sqlite"
+STORAGE_BACKEND = "csv"
+SQLITE_DB_PATH = "data/court_booking.db"
+# User store: "dbm" (hashed lookups on demand), "csv" or "sqlite"; None follows STORAGE_BACKEND
+USER_STORE_BACKEND = "dbm"
+USERS_DBM_PATH = "data/users.dbm"
+# Passwords are stored as salted PBKDF2-SHA256 hashes; verified logins are cached (LRU) for repeat logins
+PASSWORD_HASH_ITERATIONS = 200000
+SESSION_CACHE_SIZE = 1024
+# Usernames (upper case) allowed to see the performance stats of the menu
+ADMIN_USERS = set()
+
+# Calendar dates: bookings carry a YYYY-MM-DD date within a rolling horizon instead of a weekday name,
+# and the CSV backend stores them in one partition per ISO week next to the CSV (data/bookings/)
+CALENDAR_DATES = False
+BOOKING_HORIZON_DAYS = 28
+
+# CSV backend: load only active bookings; canceled ones move to data/bookings_history.csv on each snapshot.
+# Off by default: run `python storage.py archive` to move them once
+LIVE_BOOKINGS_ONLY = False
+# Save the parsed bookings, indexes and availability grid to data/bookings.snapshot for fast starts
+STARTUP_SNAPSHOT = True
+
+# Integrity check of the bookings whenever they are parsed at startup (see fsck.py):
+# None (off), "warn" (report), "repair" (fix and save) or "strict" (refuse to start if anything is wrong).
+# The SQLite backend is checked for duplicate IDs and overlaps only, without loading its bookings
+STARTUP_FSCK = "warn"
+
+# Keep loaded bookings in compact typed columns instead of one namedtuple each (for very large histories)
+COMPACT_BOOKINGS = False
+
+# Availability search: how far from the preferred time to look, and how many results to show
+SEARCH_WINDOW_HOURS = 2
+SEARCH_RESULT_LIMIT = 10
+# Recent search results kept (LRU); a booking change only invalidates results for its own day and court
+SEARCH_CACHE_SIZE = 512
+
+# Waitlist (data/waitlist.csv): when a cancellation frees a slot, matching waiters are booked into it
+# first come, first served; with WAITLIST_AUTO_PROMOTE off they are only notified at their next login
+WAITLIST_AUTO_PROMOTE = True
+
+# Venues, each with its own courts, opening hours (closing time exclusive) and slot length in minutes.
+# The default venue keeps the data/ files; every other venue stores its data under VENUES_DIR/<name>/.
+VENUES = {
+    "main": {"courts": ["A", "B", "C", "D", "E", "F", "G", "H"], "opens": "08:00 AM", "closes": "10:00 PM", "slot_minutes": 30},
+}
+DEFAULT_VENUE = "main"
+VENUES_DIR = "data/venues"
+
+# List of valid 30-minute time slots from 08:00 AM to 09:30 PM (the default venue's slots)
 VALID_TIME_SLOTS = [
     "08:00 AM", "08:30 AM",
     "09:00 AM", "09:30 AM",
@@ -0,0 +1,218 @@
+# court_allocation.py
+#
+# Court assignment for batches of flexible requests (leagues, tournaments):
+#   python court_allocation.py requests.jsonl            # print the plan, ask before booking it
+#   python court_allocation.py requests.jsonl --yes      # book it without asking
+# Each JSON line is one request: {"id": "R1", "username": "ann", "day": "Monday", "earliest": "10:00 AM",
+# "latest": "02:00 PM", "duration": 1, "court": null, "priority": 0} (court and priority are optional).
+# The plan is computed against the current availability grid without changing it; committing it books
+# every assignment with one all-or-nothing bulk write.
+
+import sys
+import json
+import math
+import argparse
+from collections import namedtuple
+from bookings import BookingRequest
+from venues import get_venue
+import users
+
+# A request may name a court; otherwise any court will do. Higher priorities are placed first.
+AllocationRequest = namedtuple('AllocationRequest',
+                               ['request_id', 'username', 'day', 'earliest', 'latest', 'duration_hours', 'court_id', 'priority'],
+                               defaults=(None, 0))
+Assignment = namedtuple('Assignment', ['request', 'court_id', 'day', 'start_time', 'end_time'])
+
+
+class AllocationPlan:
+    def __init__(self, assignments, rejected):
+        """Initialize a plan from its assignments and its (request, reason) rejections."""
+        self.assignments = assignments
+        self.rejected = rejected
+
+    def score(self):
+        """Rank plans: more accepted requests first, then more accepted priority."""
+        return len(self.assignments), sum(assignment.request.priority for assignment in self.assignments)
+
+    def booking_requests(self):
+        """Return (BookingRequest, username) pairs for every assignment."""
+        return [(BookingRequest(a.court_id, a.day, a.start_time, a.end_time, a.request.duration_hours), a.request.username)
+                for a in self.assignments]
+
+    def commit(self, bookings):
+        """Book every assignment with one bulk write. Returns the created bookings ([] if anything clashed)."""
+        pairs = self.booking_requests()
+        return bookings.create_bookings_bulk([request for request, _ in pairs], None,
+                                             usernames=[username for _, username in pairs])
+
+
+def free_run_length(mask, slot, slot_count, step):
+    """Count the free slots next to `slot` in one direction (step -1 or +1) of a court's mask."""
+    count = 0
+    slot += step
+    while 0 <= slot < slot_count and not (mask >> slot) & 1:
+        count += 1
+        slot += step
+    return count
+
+
+# 1. Separating Functions and Data:
+# The allocator works on a copy of the grid masks, so planning never touches the live availability.
+class CourtAllocator:
+    def __init__(self, court_filter):
+        """Initialize an allocator over a venue's current court availability."""
+        self.court_filter = court_filter
+        self.grid = court_filter.grid
+        self.slots = court_filter.slots
+
+    def window(self, request):
+        """Return (day index, first start slot, last start slot, length) of a request, or a reason it is invalid."""
+        day = self.court_filter.get_day_index(str(request.day).capitalize())
+        if day is None:
+            return f"invalid day {request.day}"
+        if request.court_id is not None and request.court_id not in self.grid.court_index:
+            return f"unknown court {request.court_id}"
+        length = self.slots.duration_slots(request.duration_hours)
+        if length is None:
+            return f"the duration is not a positive number of {self.slots.slot_minutes}-minute slots"
+        first = self.slots.slot_index(self.slots.normalize(request.earliest) or "")
+        end = self.slots.boundary_index(self.slots.normalize(request.latest) or "")
+        if first is None or end is None or end - first < length:
+            return "the duration does not fit between the earliest start and latest end"
+        return day, first, end - length, length
+
+    def candidates(self, masks, request, window):
+        """Return (court, start) placements of a request that are free in the given masks."""
+        day, first, last, length = window
+        courts = [request.court_id] if request.court_id else self.grid.courts
+        window_mask = ((1 << (last - first + 1)) - 1) << first
+        placements = []
+        for court in courts:
+            court_mask = masks[day][self.grid.court_index[court]]
+            free = ~court_mask & self.grid.full_mask
+            starts = free
+            for offset in range(1, length):
+                starts &= free >> offset
+            starts &= window_mask
+            while starts:
+                start = (starts & -starts).bit_length() - 1
+                placements.append((court, start))
+                starts &= starts - 1
+        return placements
+
+    def best_fit(self, masks, day, length, placements):
+        """
+        Pick the placement that leaves the smallest free gaps around it (best fit), so long free runs
+        stay available for the requests still to come. Ties go to the earliest court and start.
+        """
+        def leftover(placement):
+            court, start = placement
+            mask = masks[day][self.grid.court_index[court]]
+            before = free_run_length(mask, start, self.grid.slot_count, -1)
+            after = free_run_length(mask, start + length - 1, self.grid.slot_count, 1)
+            # A gap of zero is perfect; otherwise smaller gaps waste less
+            return (min(before, after), before + after, self.grid.court_index[court], start)
+        return min(placements, key=leftover)
+
+    def allocate(self, masks, requests, windows, order):
+        """Place requests greedily in the given order. Returns an AllocationPlan."""
+        assignments, rejected = [], []
+        for index in order:
+            request, window = requests[index], windows[index]
+            placements = self.candidates(masks, request, window)
+            if not placements:
+                rejected.append((request, "no free court in the requested window"))
+                continue
+            day, _, _, length = window
+            court, start = self.best_fit(masks, day, length, placements)
+            masks[day][self.grid.court_index[court]] |= self.grid.run_mask(start, length)
+            assignments.append(Assignment(request, court, self.court_filter.day_names[day],
+                                          self.slots.times[start], self.slots.boundaries[start + length]))
+        return AllocationPlan(assignments, rejected)
+
+    def plan(self, requests):
+        """
+        Assign courts and start times to a batch of requests, maximizing the number accepted.
+        Requests are placed by priority, and within a priority by a few interval-scheduling orders
+        (most constrained first, earliest deadline first, longest first); the plan accepting the most wins.
+        """
+        requests = list(requests)
+        windows = [self.window(request) for request in requests]
+        invalid = [(request, window) for request, window in zip(requests, windows) if isinstance(window, str)]
+        valid = [i for i, window in enumerate(windows) if not isinstance(window, str)]
+        base_masks = [list(day_masks) for day_masks in self.grid.masks]
+        flexibility = {i: len(self.candidates(base_masks, requests[i], windows[i])) for i in valid}
+        orders = [
+            sorted(valid, key=lambda i: (-requests[i].priority, flexibility[i], windows[i][2], i)),
+            sorted(valid, key=lambda i: (-requests[i].priority, windows[i][2] + windows[i][3], windows[i][1], i)),
+            sorted(valid, key=lambda i: (-requests[i].priority, -windows[i][3], flexibility[i], i)),
+        ]
+        plans = [self.allocate([list(day_masks) for day_masks in base_masks], requests, windows, order) for order in orders]
+        best = max(plans, key=AllocationPlan.score)  # The first of equally good plans wins
+        best.rejected = invalid + best.rejected
+        return best
+
+
+def read_requests(lines):
+    """
+    Parse JSON-line allocation requests. Returns (requests, rejected), where rejected holds
+    (request ID or line number, reason) for every line that is not a valid request.
+    """
+    requests, rejected = [], []
+    for number, line in enumerate(filter(str.strip, lines), 1):
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            rejected.append((number, "invalid JSON"))
+            continue
+        if not isinstance(fields, dict):
+            rejected.append((number, "not a JSON object"))
+            continue
+        request_id = fields.get("id", number)
+        missing = [key for key in ("username", "day", "earliest", "latest", "duration") if fields.get(key) in (None, "")]
+        if missing:
+            rejected.append((request_id, f"missing {', '.join(missing)}"))
+            continue
+        try:
+            duration_hours, priority = float(fields["duration"]), int(fields.get("priority") or 0)
+        except (TypeError, ValueError, OverflowError):
+            duration_hours = priority = None
+        if duration_hours is None or not math.isfinite(duration_hours):
+            rejected.append((request_id, "duration and priority must be numbers"))
+            continue
+        requests.append(AllocationRequest(
+            request_id=request_id,
+            username=str(fields["username"]).strip().upper(),
+            day=str(fields["day"]),
+            earliest=str(fields["earliest"]),
+            latest=str(fields["latest"]),
+            duration_hours=duration_hours,
+            court_id=str(fields["court"]).strip().upper() if fields.get("court") else None,
+            priority=priority,
+        ))
+    return requests, rejected
+
+
+if __name__ == "__main__":
+    from startup_snapshot import open_booking_state
+
+    parser = argparse.ArgumentParser(description="Assign courts to a batch of flexible booking requests.")
+    parser.add_argument("requests", help="JSONL allocation requests ('-' for stdin)")
+    parser.add_argument("--venue", default=None, help="venue to book (default: the default venue)")
+    parser.add_argument("--yes", action="store_true", help="book the plan without asking for approval")
+    args = parser.parse_args()
+
+    bookings, court_filter, snapshot = open_booking_state(venue=get_venue(args.venue))
+    with (sys.stdin if args.requests == "-" else open(args.requests, "r")) as file:
+        requests, unreadable = read_requests(file)
+    plan = CourtAllocator(court_filter).plan(requests)
+    for assignment in plan.assignments:
+        print(f"{assignment.request.request_id}: Court {assignment.court_id}, {assignment.day} "
+              f"{assignment.start_time}-{assignment.end_time} for {assignment.request.username}")
+    for request_id, reason in unreadable + [(request.request_id, reason) for request, reason in plan.rejected]:
+        print(f"{request_id}: rejected ({reason})")
+    print(f"{len(plan.assignments)} of {len(requests) + len(unreadable)} requests can be placed.")
+    if plan.assignments and (args.yes or users.get_user_input("Book this plan? (y/n): ").strip().lower() == 'y'):
+        plan.commit(bookings)
+        if snapshot:
+            snapshot.refresh(bookings, court_filter)
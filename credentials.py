@@ -0,0 +1,77 @@
+# credentials.py
+
+import os
+import hmac
+import hashlib
+from collections import OrderedDict
+import config
+
+HASH_SCHEME = "pbkdf2_sha256"
+SALT_BYTES = 16
+
+
+def hash_password(password, iterations=None, salt=None):
+    """Return a salted PBKDF2 hash stored as pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>."""
+    iterations = iterations or config.PASSWORD_HASH_ITERATIONS
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_password_hash(stored):
+    """Check whether a stored password is a hash rather than legacy plain text."""
+    return stored.startswith(HASH_SCHEME + "$")
+
+
+def verify_password(stored, password):
+    """Check a password against a stored hash (or a legacy plain-text password)."""
+    if not is_password_hash(stored):
+        return hmac.compare_digest(stored.encode(), password.encode())
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        expected = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    except ValueError:
+        return False  # Malformed hash
+    return hmac.compare_digest(expected.hex(), digest)
+
+
+# Verified logins are remembered so repeat logins skip the key derivation. Entries hold a fast
+# digest of (stored hash, password), never the password, and stop matching if the stored hash changes.
+class SessionCache:
+    def __init__(self, capacity=None):
+        """Initialize an empty LRU cache of verified credentials."""
+        self.capacity = config.SESSION_CACHE_SIZE if capacity is None else capacity
+        self.entries = OrderedDict()  # USERNAME -> fast digest
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, stored, password):
+        """Return the cheap digest identifying one verified (stored hash, password) pair."""
+        return hmac.new(stored.encode(), password.encode(), hashlib.sha256).digest()
+
+    def cached(self, username, stored, password):
+        """Check whether this (stored hash, password) pair was verified recently, without PBKDF2."""
+        cached = self.entries.get(username)
+        if cached is not None and hmac.compare_digest(cached, self.digest(stored, password)):
+            self.entries.move_to_end(username)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, username, stored, password):
+        """Remember a verified (stored hash, password) pair, evicting the least recently verified user."""
+        if self.capacity > 0:
+            self.entries[username] = self.digest(stored, password)
+            self.entries.move_to_end(username)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def verify(self, username, stored, password):
+        """Verify a password, consulting the cache before paying for PBKDF2."""
+        if self.cached(username, stored, password):
+            return True
+        if not verify_password(stored, password):
+            return False
+        self.remember(username, stored, password)
+        return True
@@ -1,50 +1,90 @@
 # filter_courts.py
 
-from datetime import datetime, timedelta
-from config import VALID_TIME_SLOTS
+from datetime import date
+from config import CALENDAR_DATES, BOOKING_HORIZON_DAYS
+from venues import get_venue
+from calendar_days import parse_date, horizon_dates
+import instrumentation
+from availability_grid import AvailabilityGrid, DAYS_PER_WEEK, DAY_NAMES, DAY_INDEX
+from availability_search import SearchCache
 
 # 1. Separating Functions and Data:
 # The court availability data is managed separately from the functions that manipulate it.
+# CourtFilter is a facade over AvailabilityGrid, which keeps one bitmask per (day, court).
 class CourtFilter:
-    def __init__(self):
-        """Initialize court availability for all days and courts."""
-        self.days = self.initialize_days()  # 1. Separating functions and data
+    def __init__(self, start_date=None, venue=None):
+        """Initialize court availability for all days and courts of a venue."""
+        self.venue = venue or get_venue()
+        self.slots = self.venue.slots
+        # With calendar dates the grid covers the booking horizon and day 0 is start_date (today)
+        self.start_date = (start_date or date.today()) if CALENDAR_DATES else None
+        self.grid = self.initialize_days()  # 1. Separating functions and data
+        # Generation of each (day, court), bumped by every change there; tags cached search results
+        self.generations = {}
+        self.search_cache = SearchCache()
 
     def initialize_days(self):
-        """Initialize courts and their time slots for each day."""
-        days = {}
-        for day in range(7):  # 0: Monday, 6: Sunday
-            # 10. List Comprehensions: Initialize each court with available time slots
-            days[day] = {court: self.initialize_time_slots() for court in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']}  # 10. List Comprehensions
-        return days
+        """Initialize an empty availability grid covering every day and court."""
+        return AvailabilityGrid(self.venue.courts, self.slots.times, BOOKING_HORIZON_DAYS if self.start_date else DAYS_PER_WEEK)
+
+    @property
+    def day_names(self):
+        """The day each grid index stands for: weekday names, or YYYY-MM-DD dates across the horizon."""
+        if self.start_date:
+            self.roll_horizon()
+            return [day_date.isoformat() for day_date in horizon_dates(self.start_date, len(self.grid.masks))]
+        return list(DAY_NAMES)
+
+    def roll_horizon(self, today=None):
+        """
+        Move the horizon forward once the date has changed (a long-running server crossing midnight):
+        days that have passed drop off the grid and empty days are added at its end.
+        """
+        today = today or date.today()
+        if self.start_date and today > self.start_date:
+            self.grid.shift((today - self.start_date).days)
+            self.start_date = today
+            # Day indexes now name other dates, so every generation and cached search is void
+            self.generations.clear()
+            self.search_cache.clear()
 
     def initialize_time_slots(self):
         """Initialize all time slots as available."""
-        time_slots = {}
-        for time_str in VALID_TIME_SLOTS:
-            time_slots[time_str] = True  # 10. List Comprehensions
-        return time_slots
+        return {time_str: True for time_str in self.slots.times}  # 10. List Comprehensions
+
+    @property
+    def days(self):
+        """Dictionary view of the grid ({day: {court: {time_slot: available}}}), built on demand."""
+        return {
+            day: {
+                court: {time_str: not (mask >> i) & 1 for i, time_str in enumerate(self.grid.time_slots)}
+                for court, mask in zip(self.grid.courts, masks)
+            }
+            for day, masks in enumerate(self.grid.masks)
+        }  # 10. List Comprehensions
+
+    def has_time_slot(self, time_slot):
+        """Check whether a time slot is one of the bookable slots."""
+        return time_slot in self.grid.slot_index
 
     def is_day_full(self, day):
         """Check if a specific day is fully booked."""
-        # 7. Filtering: Check availability across all courts
-        for court, times in self.days[day].items():
-            if any(times.values()):
-                return False
-        return True
+        return self.grid.is_day_full(day)
 
     def book_time_slot(self, day, court, time_slot):
         """Mark a specific time slot as booked."""
-        if court not in self.days[day]:
-            print(f"Invalid court name: {court}. Please choose between A-H.")
+        if court not in self.grid.court_index:
+            print(f"Invalid court name: {court}. Please choose between {self.venue.court_label}.")
             return False
 
-        if time_slot not in self.days[day][court]:
+        slot = self.grid.slot_index.get(time_slot)
+        if slot is None:
             print(f"Invalid time slot: {time_slot}. Please enter time in HH:MM AM/PM format.")
             return False
 
-        if self.days[day][court][time_slot]:  # Check if time slot is available
-            self.days[day][court][time_slot] = False  # Mark as booked
+        if self.grid.is_slot_free(day, court, slot):  # Check if time slot is available
+            self.grid.book(day, court, slot, 1)  # Mark as booked
+            self.bump_generation(day, court)
             print(f"Booked court {court} on day {day + 1} at {time_slot}.")
             return True
         else:
@@ -53,19 +93,17 @@ class CourtFilter:
 
     def available_courts(self, day, time_slot):
         """Return a list of available courts for a given day and time slot."""
-        # 9. Lambdas: Filtering available courts using a lambda function
-        available = list(filter(
-            lambda court: self.days[day][court].get(time_slot, False),
-            self.days[day]
-        ))
-        return available  # 10. List Comprehensions
+        slot = self.grid.slot_index.get(time_slot)
+        if slot is None:
+            return []
+        return self.grid.free_courts(day, slot)
 
     def check_full_days(self):
         """Print and return a list of fully booked days."""
         # 7. Filtering: Identify fully booked days
         full_days = list(filter(
             lambda day: self.is_day_full(day),
-            range(7)
+            range(len(self.grid.masks))
         ))
         full_days = list(map(lambda d: d + 1, full_days))  # 9. Lambdas
         if full_days:
@@ -76,43 +114,78 @@ class CourtFilter:
 
     def is_time_slot_available(self, day, court, time_slot):
         """Check if a specific time slot is available for a court on a given day."""
-        return self.days.get(day, {}).get(court, {}).get(time_slot, False)
+        slot = self.grid.slot_index.get(time_slot)
+        if slot is None or court not in self.grid.court_index or not 0 <= day < len(self.grid.masks):
+            return False
+        return self.grid.is_slot_free(day, court, slot)
 
+    @instrumentation.instrument("synchronize_with_bookings")
     def synchronize_with_bookings(self, bookings):
         """Update court availability based on existing bookings."""
+        if instrumentation.ENABLED and hasattr(bookings, '__len__'):
+            instrumentation.count_rows("synchronize_with_bookings", len(bookings))
+        self.search_cache.clear()  # Bulk changes are not tracked by generation
         for booking in bookings:
             if booking.day and booking.court_id and booking.start_time and booking.end_time:
                 day_index = self.get_day_index(booking.day)
                 court = booking.court_id.upper()
-                start_slot = booking.start_time.upper()
-                end_slot = booking.end_time.upper()
                 if booking.status == 'active':
-                    if day_index is not None and court in self.days[day_index]:
-                        slots = self.calculate_time_slots(start_slot, end_slot)
-                        for slot in slots:
-                            if slot in self.days[day_index][court]:
-                                self.days[day_index][court][slot] = False  # Mark as unavailable
+                    if day_index is not None and court in self.grid.court_index:
+                        start, length = self.slots.slot_range(booking.start_time.upper(), booking.end_time.upper())
+                        self.grid.book(day_index, court, start, length)  # Mark as unavailable
+
+    def apply_booking_event(self, event, booking):
+        """Apply a single 'create' or 'cancel' event from Bookings, touching only that booking's slots."""
+        day_index = self.get_day_index(booking.day)
+        court = booking.court_id.upper()
+        if day_index is None or court not in self.grid.court_index:
+            return
+        start, length = self.slots.slot_range(booking.start_time.upper(), booking.end_time.upper())
+        if event == 'create':
+            self.grid.book(day_index, court, start, length)
+        elif event == 'cancel':
+            self.grid.release(day_index, court, start, length)  # Freed slots become available again
+        self.bump_generation(day_index, court)
+
+    def bump_generation(self, day, court):
+        """Record a change on one court and day, invalidating the cached searches that used it."""
+        self.generations[day, court] = self.generations.get((day, court), 0) + 1
+
+    def day_generations(self, day):
+        """Return the generations of every court on a day, as stored with cached search results."""
+        return tuple(self.generations.get((day, court), 0) for court in self.grid.courts)
+
+    def resynchronize(self, bookings):
+        """Rebuild availability from scratch, e.g. after the bookings were reloaded from disk."""
+        if self.start_date:
+            self.start_date = date.today()  # Roll the horizon forward
+        self.grid.clear()
+        self.synchronize_with_bookings(bookings)
+
+    def grid_state(self):
+        """Return the grid masks (and horizon start) as saved by the startup snapshot."""
+        return {"start_date": self.start_date, "courts": self.grid.courts, "times": self.grid.time_slots, "masks": self.grid.masks}
+
+    def restore_grid(self, state):
+        """Adopt saved grid masks. Returns False (leaving the grid alone) if they do not fit this grid or day."""
+        if (state["start_date"] != self.start_date or len(state["masks"]) != len(self.grid.masks)
+                or state["courts"] != self.grid.courts or state["times"] != self.grid.time_slots):
+            return False  # A horizon that started on another day, or a venue that was reconfigured
+        self.grid.masks = [list(masks) for masks in state["masks"]]
+        self.search_cache.clear()
+        return True
 
     def get_day_index(self, day_name):
-        """Convert day name to index."""
-        days_mapping = {
-            'Monday': 0,
-            'Tuesday': 1,
-            'Wednesday': 2,
-            'Thursday': 3,
-            'Friday': 4,
-            'Saturday': 5,
-            'Sunday': 6
-        }
-        return days_mapping.get(day_name, None)
+        """Convert a day name (or a YYYY-MM-DD date inside the horizon) to a grid index."""
+        if self.start_date:
+            self.roll_horizon()
+            day_date = parse_date(day_name)
+            if day_date is None:
+                return None
+            offset = (day_date - self.start_date).days
+            return offset if 0 <= offset < len(self.grid.masks) else None
+        return DAY_INDEX.get(day_name, None)
 
     def calculate_time_slots(self, start_time, end_time):
         """Calculate all 30-minute time slots between start_time and end_time."""
-        start_dt = datetime.strptime(start_time, "%I:%M %p")
-        end_dt = datetime.strptime(end_time, "%I:%M %p")
-        slots = []
-        while start_dt < end_dt:
-            slot_time = start_dt.strftime("%I:%M %p")
-            slots.append(slot_time)
-            start_dt += timedelta(minutes=30)
-        return slots
+        return self.slots.slots_between(start_time, end_time)
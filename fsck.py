@@ -0,0 +1,215 @@
+# fsck.py
+#
+# Integrity check of the stored bookings, like fsck for a file system:
+#   python fsck.py                 # report problems (exit status 1 if there are any)
+#   python fsck.py --repair        # also fix them, after backing up the data files
+#   python fsck.py --venue north
+# Checks: duplicate booking IDs, unknown courts and days, start/end times off the venue's slots or
+# outside opening hours, durations that do not match start and end, and overlapping active bookings.
+# Overlaps are found by one sweep per (court, day) over start-sorted intervals: O(n log n) to sort,
+# plus the number of conflicting pairs reported. config.STARTUP_FSCK runs the check on every start;
+# for the SQLite store it only checks duplicate IDs and overlaps, with indexed queries.
+
+import os
+import sys
+import heapq
+import shutil
+import argparse
+from collections import namedtuple
+from storage import BookingRowValidator, BAD_COURT, BAD_DAY, BAD_TIME, BAD_DURATION
+from venues import get_venue
+import config
+
+Problem = namedtuple('Problem', ['booking_id', 'kind', 'detail'])
+
+# Problem kinds besides the per-row ones of BookingRowValidator (bad court, day, time, duration)
+DUPLICATE_ID, OVERLAP = 'duplicate_id', 'overlap'
+
+
+class CheckResult:
+    def __init__(self):
+        """Initialize an empty result."""
+        self.problems = []
+        self.positions = {}  # Problem kind -> positions (in the checked sequence) of the bookings involved
+
+    def add(self, kind, position, booking_id, detail):
+        """Record one problem with the booking at `position`."""
+        self.problems.append(Problem(booking_id, kind, detail))
+        self.positions.setdefault(kind, []).append(position)
+
+    def __bool__(self):
+        return bool(self.problems)
+
+    def summary(self):
+        """Return 'N problems (kind: count, ...)'."""
+        counts = {}
+        for problem in self.problems:
+            counts[problem.kind] = counts.get(problem.kind, 0) + 1
+        return f"{len(self.problems)} problem(s) (" + ", ".join(f"{kind}: {count}" for kind, count in counts.items()) + ")"
+
+
+def check_bookings(bookings, venue=None):
+    """Check a sequence of bookings against the venue's invariants. Returns a CheckResult."""
+    venue = venue or get_venue()
+    validator = BookingRowValidator(venue)
+    result = CheckResult()
+    seen_ids = {}
+    runs = {}  # (court, day) -> [(start, end, booking_id, position)] of well-formed active bookings
+    for position, booking in enumerate(bookings):
+        if booking.booking_id in seen_ids:
+            result.add(DUPLICATE_ID, position, booking.booking_id, f"also used by the booking at row {seen_ids[booking.booking_id] + 1}")
+        else:
+            seen_ids[booking.booking_id] = position
+        start, end, problem, detail = validator.check(booking)
+        if problem:
+            result.add(problem, position, booking.booking_id, detail)
+            if problem != BAD_DURATION:
+                continue
+        if booking.status == 'active':
+            runs.setdefault((booking.court_id, booking.day), []).append((start, end, booking.booking_id, position))
+
+    for (court, day), run in runs.items():
+        # Sweep in start order; `open_ends` holds the bookings still running at the current start
+        run.sort()
+        open_ends = []
+        for start, end, booking_id, position in run:
+            while open_ends and open_ends[0][0] <= start:
+                heapq.heappop(open_ends)
+            for _, other_id, other_position in open_ends:
+                result.add(OVERLAP, position, booking_id, f"overlaps active booking {other_id} on court {court}, {day}")
+                result.positions[OVERLAP].append(other_position)  # Both sides of a clash are involved
+            heapq.heappush(open_ends, (end, booking_id, position))
+    return result
+
+
+def check_indexed_store(store):
+    """
+    Check an indexed booking store (SQLite) for duplicate IDs and overlapping active bookings with
+    indexed queries, without loading the bookings. Returns a CheckResult without positions to repair.
+    """
+    result = CheckResult()
+    for booking_id, count in store.duplicate_ids():
+        result.add(DUPLICATE_ID, None, booking_id, f"stored {count} times")
+    for booking_id, other_id, court, day in store.overlapping_bookings():
+        result.add(OVERLAP, None, booking_id, f"overlaps active booking {other_id} on court {court}, {day}")
+    return result
+
+
+def repair_bookings(bookings, result, venue=None, max_booking_id=0, can_change=None):
+    """
+    Fix the problems of a CheckResult in place and return (bookings changed, bookings left unrepaired):
+    duplicate IDs get new IDs, mismatched durations are recomputed from start and end,
+    and active bookings that are malformed or overlap an earlier-booked (lower ID) one are canceled.
+    Bookings whose day fails can_change(day) (e.g. in a closed week) are left as they are.
+    """
+    venue = venue or get_venue()
+    changed, skipped = set(), set()
+
+    def fix(position, **fields):
+        """Replace fields of one booking if its day can still be changed."""
+        if can_change is not None and not can_change(bookings[position].day):
+            skipped.add(position)
+            return
+        bookings[position] = bookings[position]._replace(**fields)
+        changed.add(position)
+
+    next_id = max([max_booking_id] + [booking.booking_id for booking in bookings]) + 1
+    for position in result.positions.get(DUPLICATE_ID, []):
+        fix(position, booking_id=next_id)
+        next_id += 1
+    for position in result.positions.get(BAD_DURATION, []):
+        booking = bookings[position]
+        start, end = venue.slots.boundary_index(booking.start_time), venue.slots.boundary_index(booking.end_time)
+        fix(position, duration=venue.slots.format_duration((end - start) * venue.slots.slot_minutes / 60))
+    for kind in (BAD_COURT, BAD_DAY, BAD_TIME):
+        for position in result.positions.get(kind, []):
+            if bookings[position].status == 'active':
+                fix(position, status='canceled')
+    # Overlaps: the earliest-booked booking keeps the court, so accept active bookings by ID and cancel clashes
+    accepted = {}
+    for position in sorted(set(result.positions.get(OVERLAP, [])), key=lambda p: bookings[p].booking_id):
+        booking = bookings[position]
+        if booking.status != 'active':
+            continue
+        start, end = venue.slots.boundary_index(booking.start_time), venue.slots.boundary_index(booking.end_time)
+        taken = accepted.setdefault((booking.court_id, booking.day), [])
+        if any(start < other_end and other_start < end for other_start, other_end in taken):
+            fix(position, status='canceled')
+        else:
+            taken.append((start, end))
+    return len(changed), len(skipped - changed)
+
+
+def repair_supported(store):
+    """Check whether fsck can repair a booking store (the CSV stores, which are saved as a whole)."""
+    return not store.indexed
+
+
+def fsck(bookings_state, repair=False, venue=None):
+    """
+    Check a Bookings instance and optionally repair and save it. Returns the CheckResult of the check
+    (before repairs). Repairs back up the store's files to <file>.bak first.
+    """
+    venue = venue or bookings_state.venue
+    bookings = bookings_state.bookings
+    result = check_bookings(bookings, venue)
+    if repair and result:
+        if not repair_supported(bookings_state.store):
+            raise ValueError("Repairs are only supported by the CSV booking stores.")
+        for path in bookings_state.store.source_paths():
+            if os.path.exists(path):
+                shutil.copy2(path, path + ".bak")
+        # Closed weeks of the partitioned store are never rewritten, so their bookings are not repaired
+        changed, skipped = repair_bookings(bookings, result, venue, bookings_state.max_booking_id,
+                                           bookings_state.store.can_change)
+        bookings_state.bookings = bookings  # Rebuilds the indexes
+        bookings_state.store.save_all(bookings_state.bookings, bookings_state.max_booking_id)
+        bookings_state.loaded_signature = bookings_state.store.signature()
+        print(f"fsck: repaired {changed} booking(s)." + (f" {skipped} in closed weeks left as they are." if skipped else ""))
+    return result
+
+
+def startup_mode(store):
+    """Return config.STARTUP_FSCK, falling back from "repair" to "warn" for stores that cannot be repaired."""
+    mode = config.STARTUP_FSCK
+    if mode not in (None, "warn", "repair", "strict"):
+        raise ValueError(f"config.STARTUP_FSCK must be None, 'warn', 'repair' or 'strict', not {mode!r}.")
+    if mode == "repair" and not repair_supported(store):
+        print("fsck: STARTUP_FSCK = 'repair' is only supported by the CSV booking stores; checking only.")
+        return "warn"
+    return mode
+
+
+def startup_check(bookings_state):
+    """Run the configured startup check (config.STARTUP_FSCK): None, "warn", "repair" or "strict"."""
+    mode = startup_mode(bookings_state.store)
+    if not mode:
+        return None
+    if bookings_state.store.indexed:
+        result = check_indexed_store(bookings_state.store)  # Loading the whole history would undo the indexed startup
+    else:
+        result = fsck(bookings_state, repair=(mode == "repair"))
+    if result:
+        print(f"fsck: {bookings_state.file_path}: {result.summary()}. Run 'python fsck.py' for details.")
+        if mode == "strict":
+            sys.exit(f"fsck: refusing to start with inconsistent bookings in {bookings_state.file_path}.")
+    return result
+
+
+if __name__ == "__main__":
+    from bookings import Bookings
+
+    parser = argparse.ArgumentParser(description="Check (and optionally repair) the stored bookings.")
+    parser.add_argument("--venue", default=None, help="venue to check (default: the default venue)")
+    parser.add_argument("--repair", action="store_true", help="fix the problems found (backs up the data files)")
+    args = parser.parse_args()
+
+    venue = get_venue(args.venue)
+    bookings_state = Bookings(venue=venue, compact=False)
+    if args.repair and not repair_supported(bookings_state.store):
+        parser.error("--repair is only supported by the CSV booking stores.")
+    result = fsck(bookings_state, repair=args.repair, venue=venue)
+    for problem in result.problems:
+        print(f"Booking {problem.booking_id}: {problem.kind}: {problem.detail}")
+    print(f"{venue.bookings_path}: {result.summary() if result else 'clean'}")
+    sys.exit(1 if result and not args.repair else 0)
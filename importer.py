@@ -0,0 +1,228 @@
+# importer.py
+#
+# Import of large booking exports (e.g. when onboarding a venue):
+#   python importer.py export.csv --venue north --out clean.csv --rejects rejects.csv
+# The file is split into byte-range chunks that worker processes parse and validate in parallel
+# (fields, court, day, times on the venue's slots, duration matching start and end). Each worker also
+# sorts its active bookings into per-(court, day) runs; the parent merges the runs of every chunk to find
+# overlapping bookings and duplicate IDs, then the workers write their share of the clean file.
+# Rows that fail are listed in the rejects report with their line number and the reason.
+
+import os
+import csv
+import heapq
+import shutil
+import argparse
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from storage import BOOKING_FIELDS, BookingRowValidator, booking_to_row, fields_to_booking
+from venues import get_venue
+
+# Statuses a booking can have in an export
+VALID_STATUSES = ('active', 'canceled', 'completed', 'expired', 'no_show', 'no-show')
+# Chunks per worker, so uneven chunks still keep every worker busy
+CHUNKS_PER_WORKER = 4
+REJECT_FIELDS = ['line', 'reason', 'row']
+
+
+def chunk_ranges(file_path, chunks):
+    """Split a file (after its header line) into byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as file:
+        file.readline()
+        start = file.tell()
+        bounds = [start]
+        for i in range(1, chunks):
+            file.seek(max(start + (size - start) * i // chunks, bounds[-1]))
+            file.readline()  # Move to the start of the next line
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [(low, high) for low, high in zip(bounds, bounds[1:]) if high > low]
+
+
+def validate_row(validator, fields):
+    """Return (Booking, start slot, end slot, None) for a valid row, or (None, None, None, reason)."""
+    try:
+        booking = fields_to_booking(fields)
+    except ValueError:
+        return None, None, None, "booking_id is not a number"
+    start, end, problem, reason = validator.check(booking)
+    if problem:
+        return None, None, None, reason
+    if booking.status not in VALID_STATUSES:
+        return None, None, None, f"unknown status {booking.status or '(empty)'}"
+    return booking, start, end, None
+
+
+def read_chunk_lines(file_path, low, high):
+    """Return the lines in bytes [low, high) of a file, as written in it (without their line breaks)."""
+    with open(file_path, "rb") as file:
+        file.seek(low)
+        text = file.read(high - low).decode().replace("\r\n", "\n")
+    # Rows end at "\n" only (chunks are split there too); other line breaks are data
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def validate_chunk(file_path, low, high, columns, venue, part_path):
+    """
+    Parse and validate the rows in bytes [low, high) (run in a worker process).
+    Valid rows are written, normalized, to part_path. Returns (line count, rejects, booking IDs,
+    their line numbers within the chunk, {(court, day): sorted active intervals}).
+    """
+    lines = read_chunk_lines(file_path, low, high)
+    width = max(columns) + 1
+    validator = BookingRowValidator(venue)
+    rejects, clean_rows = [], []
+    ids, id_lines = array('q'), array('q')
+    runs = {}
+    rows = lines
+    if any('"' in row_text or "\r" in row_text for row_text in lines):
+        # Booking fields never hold line breaks, so a row whose quotes are not closed on its own line (a quoted
+        # field spanning lines) or with a bare carriage return is rejected, and the reader sees one row per line
+        rows = list(lines)
+        for line, row_text in enumerate(lines):
+            if row_text.count('"') % 2 or "\r" in row_text:
+                rejects.append((line, "line break inside a field (not supported in bookings)", row_text))
+                rows[line] = ""
+    # Exports written by this app have the columns in order, so rows can be sliced instead of picked
+    in_order = columns == list(range(len(BOOKING_FIELDS)))
+    for line, row in enumerate(csv.reader(rows)):
+        if not row:
+            continue  # Blank line
+        if len(row) < width:
+            rejects.append((line, f"expected {len(BOOKING_FIELDS)} fields, found {len(row)}", lines[line]))
+            continue
+        booking, start, end, reason = validate_row(validator, row[:width] if in_order else [row[column] for column in columns])
+        if reason:
+            rejects.append((line, reason, lines[line]))
+            continue
+        ids.append(booking.booking_id)
+        id_lines.append(line)
+        if booking.status == 'active':
+            runs.setdefault((booking.court_id, booking.day), []).append((start, end, booking.booking_id, line))
+        clean_rows.append(booking_to_row(booking))
+    with open(part_path, "w", newline='') as part:
+        csv.writer(part).writerows(clean_rows)
+    for run in runs.values():
+        run.sort()
+    return len(lines), rejects, ids, id_lines, runs
+
+
+def write_clean_chunk(part_path, id_lines, rejected_lines, file_path, low, high):
+    """
+    Drop the rejected lines from a chunk's part file (run in a worker process). The part file holds one
+    row per entry of id_lines, in order. Returns the clean file's path and {line: original export line}
+    of the dropped rows, re-read from bytes [low, high) of the export so the report shows them as written.
+    """
+    if not rejected_lines:
+        return part_path, {}
+    clean_path = part_path + ".clean"
+    with open(part_path, "r", newline='') as part, open(clean_path, "w", newline='') as clean:
+        for line, text in zip(id_lines, part):
+            if line not in rejected_lines:
+                clean.write(text)
+    os.remove(part_path)
+    lines = read_chunk_lines(file_path, low, high)
+    return clean_path, {line: lines[line] for line in rejected_lines}
+
+
+def find_duplicates(results):
+    """Return {(chunk, line): reason} for every repeated booking_id after its first occurrence."""
+    seen, rejected = set(), {}
+    for chunk, (_, _, ids, id_lines, _) in enumerate(results):
+        for booking_id, line in zip(ids, id_lines):
+            if booking_id in seen:
+                rejected[chunk, line] = f"duplicate booking_id {booking_id}"
+            seen.add(booking_id)
+    return rejected
+
+
+def find_overlaps(results, rejected):
+    """
+    Merge the per-(court, day) runs of every chunk and return {(chunk, line): reason} for active bookings
+    that overlap an earlier-starting one. Each key is a sweep over start-sorted intervals.
+    """
+    keys = {key for result in results for key in result[4]}
+    overlaps = {}
+    for key in keys:
+        runs = [[(start, end, booking_id, chunk, line) for start, end, booking_id, line in result[4][key]]
+                for chunk, result in enumerate(results) if key in result[4]]
+        kept_end, kept_id = None, None
+        for start, end, booking_id, chunk, line in heapq.merge(*runs):
+            if (chunk, line) in rejected:
+                continue
+            if kept_end is not None and start < kept_end:
+                overlaps[chunk, line] = f"overlaps active booking {kept_id} on court {key[0]}, {key[1]}"
+            else:
+                kept_end, kept_id = end, booking_id
+    return overlaps
+
+
+def import_bookings(file_path, out_path, rejects_path, venue=None, workers=None):
+    """Validate a booking export in parallel and write the clean bookings and a rejects report. Returns (kept, rejected)."""
+    venue = venue or get_venue()
+    workers = workers or os.cpu_count() or 1
+    with open(file_path, "r", newline='') as file:
+        header = [field.strip() for field in next(csv.reader(file), [])]
+    try:
+        columns = [header.index(field) for field in BOOKING_FIELDS]
+    except ValueError:
+        raise ValueError(f"{file_path} must start with a header naming {', '.join(BOOKING_FIELDS)}")
+    ranges = chunk_ranges(file_path, workers * CHUNKS_PER_WORKER)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_path))) as work_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        part_paths = [os.path.join(work_dir, f"part{chunk}.csv") for chunk in range(len(ranges))]
+        # Pass 1 (parallel): parse and validate each chunk
+        results = list(pool.map(validate_chunk, *zip(*[
+            (file_path, low, high, columns, venue, part_path) for (low, high), part_path in zip(ranges, part_paths)])))
+
+        # Checks across chunks: duplicate IDs, then overlaps between the remaining active bookings
+        rejected = find_duplicates(results)
+        rejected.update(find_overlaps(results, rejected))
+
+        # Pass 2 (parallel): write each chunk's clean rows, then concatenate them in order
+        lines_by_chunk = [set() for _ in ranges]
+        for chunk, line in rejected:
+            lines_by_chunk[chunk].add(line)
+        cleaned = list(pool.map(write_clean_chunk, part_paths, [result[3] for result in results], lines_by_chunk,
+                                [file_path] * len(ranges), *zip(*ranges)))
+        with open(out_path, "w", newline='') as out:
+            csv.writer(out).writerow(BOOKING_FIELDS)
+            for clean_path, _ in cleaned:
+                with open(clean_path, "r", newline='') as clean:
+                    shutil.copyfileobj(clean, out)
+
+    # Line numbers in the report count from the top of the file, the header being line 1
+    first_lines = [2]
+    for result in results:
+        first_lines.append(first_lines[-1] + result[0])
+    reports = [(first_lines[chunk] + line, reason, raw) for chunk, result in enumerate(results)
+               for line, reason, raw in result[1]]
+    reports += [(first_lines[chunk] + line, reason, cleaned[chunk][1][line]) for (chunk, line), reason in rejected.items()]
+    reports.sort()
+    with open(rejects_path, "w", newline='') as report:
+        writer = csv.writer(report)
+        writer.writerow(REJECT_FIELDS)
+        writer.writerows(reports)
+    kept = sum(len(result[2]) for result in results) - len(rejected)
+    return kept, len(reports)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate and import a large bookings CSV export in parallel.")
+    parser.add_argument("export", help="bookings CSV export (with a header row)")
+    parser.add_argument("--venue", default=None, help="venue whose courts and slots the rows must match")
+    parser.add_argument("--out", default=None, help="clean bookings CSV (default: <export>_clean.csv)")
+    parser.add_argument("--rejects", default=None, help="rejects report (default: <export>_rejects.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    base = os.path.splitext(args.export)[0]
+    out_path, rejects_path = args.out or base + "_clean.csv", args.rejects or base + "_rejects.csv"
+    kept, rejected = import_bookings(args.export, out_path, rejects_path, get_venue(args.venue), args.workers)
+    print(f"Kept {kept} bookings in {out_path}; {rejected} rejected rows listed in {rejects_path}.")
@@ -0,0 +1,154 @@
+# instrumentation.py
+#
+# Opt-in timing of the hot paths. Set these before starting the program:
+#   COURT_BOOKING_STATS=1                      record call counts, latency histograms, rows and bytes
+#   COURT_BOOKING_PROFILE=load_bookings,...    also capture a cProfile per listed operation
+#   COURT_BOOKING_STATS_FILE=data/stats.json   where dump_stats() writes (profiles go next to it)
+# When disabled, @instrument returns the original function unchanged, so there is no overhead.
+
+import os
+import json
+import math
+import time
+import cProfile
+import functools
+
+ENABLED = os.environ.get("COURT_BOOKING_STATS", "") not in ("", "0")
+PROFILE_OPERATIONS = set(filter(None, os.environ.get("COURT_BOOKING_PROFILE", "").split(",")))
+STATS_FILE = os.environ.get("COURT_BOOKING_STATS_FILE", "data/stats.json")
+
+# Histogram buckets grow by 2^(1/4) (~19%) starting at 1 microsecond
+BUCKET_RATIO = 2 ** 0.25
+BUCKET_BASE_SECONDS = 1e-6
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """Initialize an empty log-scale histogram."""
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Add one latency sample."""
+        bucket = max(0, int(math.log(max(seconds, BUCKET_BASE_SECONDS) / BUCKET_BASE_SECONDS, BUCKET_RATIO)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """Return the upper bound (seconds) of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        target, seen = fraction * self.count, 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(self.max, BUCKET_BASE_SECONDS * BUCKET_RATIO ** (bucket + 1))
+        return self.max
+
+
+class OperationStats:
+    def __init__(self):
+        """Initialize the counters for one operation."""
+        self.calls = 0
+        self.latency = LatencyHistogram()
+        self.rows_scanned = 0
+        self.bytes_written = 0
+
+    def as_dict(self):
+        """Summarize the counters with latencies in milliseconds."""
+        return {
+            "calls": self.calls,
+            "p50_ms": round(self.latency.percentile(0.50) * 1e3, 3),
+            "p95_ms": round(self.latency.percentile(0.95) * 1e3, 3),
+            "p99_ms": round(self.latency.percentile(0.99) * 1e3, 3),
+            "max_ms": round(self.latency.max * 1e3, 3),
+            "total_ms": round(self.latency.total * 1e3, 3),
+            "rows_scanned": self.rows_scanned,
+            "bytes_written": self.bytes_written,
+        }
+
+
+# Operation name -> OperationStats / cProfile.Profile
+stats = {}
+profiles = {}
+# Only one profiler can run at a time, so a profiled operation called from another one (cancel_user_booking
+# promoting a waiter through create_booking) is captured in the outer operation's profile
+active_profile = None
+
+
+def operation_stats(name):
+    """Return (creating if needed) the stats of an operation."""
+    if name not in stats:
+        stats[name] = OperationStats()
+    return stats[name]
+
+
+def instrument(name):
+    """Decorator recording calls and latency of an operation; a no-op unless instrumentation is on."""
+    def decorator(fn):
+        if not ENABLED and name not in PROFILE_OPERATIONS:
+            return fn  # Zero cost when disabled
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            global active_profile
+            profiler = None
+            if name in PROFILE_OPERATIONS and active_profile is None:
+                profiler = active_profile = profiles.setdefault(name, cProfile.Profile())
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if profiler:
+                    profiler.disable()
+                    active_profile = None
+                entry = operation_stats(name)
+                entry.calls += 1
+                entry.latency.record(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# Callers guard these with `if instrumentation.ENABLED:` so disabled runs skip even the call
+def count_rows(name, rows):
+    """Add to the rows scanned by an operation."""
+    operation_stats(name).rows_scanned += rows
+
+
+def count_bytes(name, nbytes):
+    """Add to the bytes written by an operation."""
+    operation_stats(name).bytes_written += nbytes
+
+
+def snapshot():
+    """Return every operation's summary as a dictionary."""
+    return {name: entry.as_dict() for name, entry in sorted(stats.items())}  # 10. List Comprehensions
+
+
+def format_report():
+    """Format the stats as a text table."""
+    if not stats:
+        if not ENABLED:
+            return "Instrumentation is off. Start with COURT_BOOKING_STATS=1 to collect stats."
+        return "No operations recorded yet."
+    lines = [f"{'operation':<28}{'calls':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rows':>12}{'bytes':>12}"]
+    for name, summary in snapshot().items():
+        lines.append(f"{name:<28}{summary['calls']:>8}{summary['p50_ms']:>10}{summary['p95_ms']:>10}"
+                     f"{summary['p99_ms']:>10}{summary['rows_scanned']:>12}{summary['bytes_written']:>12}")
+    return "\n".join(lines)
+
+
+def dump_stats(path=None):
+    """Write the stats as JSON (and any cProfile captures as <operation>.prof next to it). Returns the path."""
+    path = path or STATS_FILE
+    with open(path, "w") as file:
+        json.dump(snapshot(), file, indent=2)
+    for name, profiler in profiles.items():
+        profiler.dump_stats(os.path.join(os.path.dirname(path) or ".", f"{name}.prof"))
+    return path
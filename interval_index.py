@@ -0,0 +1,61 @@
+# interval_index.py
+
+from bisect import bisect_left, insort
+
+# 1. Separating Functions and Data:
+# Each (court, day) key holds a list of (start, end, booking_id) tuples sorted by start.
+# Intervals are half-open, so a booking ending at 10:00 does not clash with one starting at 10:00.
+class IntervalIndex:
+    def __init__(self):
+        """Initialize an empty interval index."""
+        self.intervals = {}
+        self.max_span = 0  # Longest interval seen, bounds how far back a conflict can start
+
+    def add(self, court, day, start, end, booking_id):
+        """Insert an interval for a booking."""
+        insort(self.intervals.setdefault((court, day), []), (start, end, booking_id))
+        self.max_span = max(self.max_span, end - start)
+
+    def remove(self, court, day, start, end, booking_id):
+        """Remove a booking's interval. Returns True if it was present."""
+        entries = self.intervals.get((court, day), [])
+        position = bisect_left(entries, (start, end, booking_id))
+        if position < len(entries) and entries[position] == (start, end, booking_id):
+            del entries[position]
+            return True
+        return False
+
+    def find_conflict(self, court, day, start, end):
+        """Return the booking_id of an interval overlapping [start, end), or None."""
+        entries = self.intervals.get((court, day), [])
+        # Every interval starting before `end` is a candidate; walk back only as far as
+        # the longest interval could reach, which is a single step for clean data.
+        position = bisect_left(entries, (end,))
+        while position > 0:
+            position -= 1
+            entry_start, entry_end, booking_id = entries[position]
+            if entry_end > start:
+                return booking_id
+            if entry_start + self.max_span <= start:
+                break
+        return None
+
+    def overlapping(self, court, day, start, end):
+        """Return the ids of every interval overlapping [start, end), in order of start."""
+        entries = self.intervals.get((court, day), [])
+        position = bisect_left(entries, (end,))
+        found = []
+        while position > 0:
+            position -= 1
+            entry_start, entry_end, entry_id = entries[position]
+            if entry_end > start:
+                found.append(entry_id)
+            elif entry_start + self.max_span <= start:
+                break
+        found.reverse()
+        return found
+
+    def clear(self):
+        """Remove every interval."""
+        self.intervals = {}
+        self.max_span = 0
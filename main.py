@@ -1,10 +1,14 @@
 # main.py
 
 import os
-from bookings import Bookings
-from filter_courts import CourtFilter
-from datetime import datetime, timedelta
+from startup_snapshot import open_booking_state
+from venues import get_venue, venue_names
+from waitlist import ANY_COURT, open_waitlist
+from availability_search import cached_alternative_slots
+from config import SEARCH_WINDOW_HOURS, SEARCH_RESULT_LIMIT
 import users  # Importing functional user management
+import instrumentation
+import config
 from functools import partial
 
 def main_menu():
@@ -14,6 +18,7 @@ def main_menu():
     print("2. Signup")
     print("3. Check your prefered time slot")
     print("4. Quit")
+    print("5. Performance Stats (admin)")
 
 def booking_actions_menu():
     """Display the booking management menu."""
@@ -22,13 +27,16 @@ def booking_actions_menu():
     print("2. Cancel a Booking")
     print("3. Create a New Booking")
     print("4. Check Court Availability")
-    print("5. Logout")
+    print("5. Join a Waitlist")
+    print("6. View or Leave Your Waitlists")
+    print("7. Logout")
 
-def user_actions(bookings, current_user, court_filter):
+def user_actions(bookings, current_user, court_filter, waitlist):
     """Handle user actions after login."""
+    waitlist.show_notifications(current_user)
     while True:
         booking_actions_menu()
-        choice = users.get_user_input("Enter your choice (1-5): ")  # 4. Passing functions as arguments
+        choice = users.get_user_input("Enter your choice (1-7): ")  # 4. Passing functions as arguments
 
         # 3. Creating a list of functions: map user choices to corresponding actions
         booking_actions = [
@@ -36,17 +44,19 @@ def user_actions(bookings, current_user, court_filter):
             lambda: cancel_booking_flow(bookings, current_user, court_filter),          # Option 2
             lambda: create_booking_flow(bookings, current_user, court_filter),          # Option 3
             lambda: check_court_availability(court_filter),                            # Option 4
-            lambda: print("\nLogging out...")                                           # Option 5
+            lambda: join_waitlist_flow(waitlist, current_user, court_filter),          # Option 5
+            lambda: view_waitlist_flow(waitlist, current_user),                        # Option 6
+            lambda: print("\nLogging out...")                                           # Option 7
         ]
 
-        if choice in ['1', '2', '3', '4', '5']:
+        if choice in ['1', '2', '3', '4', '5', '6', '7']:
             # 2. Assigning a function to a variable: select the action based on choice
             action_fn = booking_actions[int(choice) - 1]
             action_fn()
-            if choice == '5':
+            if choice == '7':
                 break  # Exit the booking management loop
         else:
-            print("Invalid choice. Please select 1, 2, 3, 4, or 5.")
+            print("Invalid choice. Please select 1 to 7.")
 
 def cancel_booking_flow(bookings, current_user, court_filter):
     """Handle the cancellation of bookings."""
@@ -64,8 +74,7 @@ def cancel_booking_flow(bookings, current_user, court_filter):
         # Attempt to cancel the booking using filtering and lambda
         success = bookings.cancel_user_booking(booking_id, current_user)
         if success:
-            # 5. Returning functions: synchronize court availability after cancellation
-            court_filter.synchronize_with_bookings(bookings.bookings)
+            # Court availability was updated by the 'cancel' event CourtFilter subscribes to
             print(f"Booking ID {booking_id} has been canceled and court availability updated.")
         else:
             print("Booking not found or already canceled.")
@@ -76,35 +85,46 @@ def cancel_booking_flow(bookings, current_user, court_filter):
             print("Cancellation process completed.")
             break
 
+def day_prompt(court_filter):
+    """Describe the days that can be entered: weekday numbers, or day numbers/dates across the horizon."""
+    day_names = court_filter.day_names
+    if court_filter.start_date:
+        return f"Enter Day (1-{len(day_names)}, where 1 is today {day_names[0]}) or a date up to {day_names[-1]}"
+    return "Enter Day of the Week (1 for Monday, 7 for Sunday)"
+
+def parse_day_input(court_filter, day_input):
+    """Return the grid index of a day number or YYYY-MM-DD date, or None if it is not bookable."""
+    if day_input.isdigit():
+        day_num = int(day_input)
+        return day_num - 1 if 1 <= day_num <= len(court_filter.day_names) else None
+    return court_filter.get_day_index(day_input) if court_filter.start_date else None
+
 def create_booking_flow(bookings, current_user, court_filter):
     """Handle the creation of new bookings."""
     while True:
-        court_id = users.get_user_input("Enter Court ID (A-H) (or type 'q' to cancel): ").strip().upper()  # 4. Passing functions as arguments
+        venue = court_filter.venue
+        court_id = users.get_user_input(f"Enter Court ID ({venue.court_label}) (or type 'q' to cancel): ").strip().upper()  # 4. Passing functions as arguments
         if court_id.lower() == 'q':
             print("Booking creation canceled.")
             break
 
-        # Validate court_id using list comprehension
-        if court_id not in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-            print("Invalid Court ID. Please enter a letter from A to H.")
+        # Validate court_id against the venue's courts
+        if court_id not in venue.courts:
+            print(f"Invalid Court ID. Please enter one of {venue.court_label}.")
             continue
 
         # Get and validate day number
         while True:
-            day_input = users.get_user_input("Enter Day of the Week (1 for Monday, 7 for Sunday) (or type 'q' to cancel): ").strip()  # 4. Passing functions as arguments
+            day_input = users.get_user_input(f"{day_prompt(court_filter)} (or type 'q' to cancel): ").strip()  # 4. Passing functions as arguments
             if day_input.lower() == 'q':
                 print("Booking creation canceled.")
                 return
-            try:
-                day_num = int(day_input)
-                if day_num < 1 or day_num > 7:
-                    raise ValueError
-                # Map day number to day name
-                days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                day = days_of_week[day_num - 1]
+            day_index = parse_day_input(court_filter, day_input)
+            if day_index is not None:
+                # Map day number to day name (or date)
+                day = court_filter.day_names[day_index]
                 break
-            except ValueError:
-                print("Invalid day number. Please enter a number between 1 (Monday) and 7 (Sunday), or 'q' to cancel.")
+            print(f"Invalid day. {day_prompt(court_filter)}, or 'q' to cancel.")
 
         # Get and validate start time
         while True:
@@ -112,24 +132,20 @@ def create_booking_flow(bookings, current_user, court_filter):
             if start_time_input.lower() == 'q':
                 print("Booking creation canceled.")
                 return
-            try:
-                # Normalize time input to ensure it has AM/PM
-                if not ("AM" in start_time_input or "PM" in start_time_input):
-                    print("Time must include AM or PM.")
-                    continue
-                # Attempt to parse time
-                parsed_start_time = datetime.strptime(start_time_input, "%I:%M %p")
-                # Reformat time to standard format
-                start_time = parsed_start_time.strftime("%I:%M %p")
-                #6) Mapping: Use map to check availability for all courts
-                availability = list(map(lambda court: start_time in court_filter.days[day_num - 1][court], court_filter.days[day_num - 1]))
-                if not any(availability):
-                    print(f"The start time slot '{start_time}' is not available. Please choose a valid 30-minute interval.")
-                    continue
-                break
-            except ValueError:
+            # Normalize time input to ensure it has AM/PM
+            if not ("AM" in start_time_input or "PM" in start_time_input):
+                print("Time must include AM or PM.")
+                continue
+            # Reformat time to standard format through the slot table
+            start_time = court_filter.slots.normalize(start_time_input)
+            if start_time is None:
                 print("Invalid time format. Please enter time in HH:MM AM/PM format (e.g., 08:00 AM), or 'q' to cancel.")
                 continue
+            # Check that the start time is one of the bookable slots
+            if not court_filter.has_time_slot(start_time):
+                print(f"The start time slot '{start_time}' is not available. Please choose a valid {court_filter.slots.slot_minutes}-minute interval.")
+                continue
+            break
 
         # Get and validate duration
         while True:
@@ -141,23 +157,19 @@ def create_booking_flow(bookings, current_user, court_filter):
                 duration_hours = float(duration_input)
                 if duration_hours <= 0:
                     raise ValueError
-                if (duration_hours * 2) != int(duration_hours * 2):
-                    print("Duration must be in multiples of 30 minutes (e.g., 1, 1.5, 2).")
+                if court_filter.slots.duration_slots(duration_hours) is None:
+                    print(f"Duration must be in multiples of {court_filter.slots.slot_minutes} minutes.")
                     continue
-                duration = f"{duration_hours} hour{'s' if duration_hours != 1 else ''}"
+                duration = court_filter.slots.format_duration(duration_hours)
                 break
             except ValueError:
-                print("Invalid duration. Please enter a positive number in 30-minute increments (e.g., 1, 1.5, 2), or 'q' to cancel.")
+                print(f"Invalid duration. Please enter a positive number in {court_filter.slots.slot_minutes}-minute increments, or 'q' to cancel.")
                 continue
 
-        # Calculate end_time based on start_time and duration
-        parsed_start_time = datetime.strptime(start_time, "%I:%M %p")
-        end_time_dt = parsed_start_time + timedelta(hours=duration_hours)
-        end_time = end_time_dt.strftime("%I:%M %p")
-
-        # Check if end_time slot exists
-        if not any(end_time in court_filter.days[day_num - 1][court] for court in court_filter.days[day_num - 1]):
-            print(f"The end time slot '{end_time}' is outside of operating hours. Please adjust your booking duration.")
+        # Calculate end_time based on start_time and duration (None if it runs past closing time)
+        end_time = court_filter.slots.end_time(start_time, duration_hours)
+        if end_time is None:
+            print(f"A {duration} booking from '{start_time}' runs outside of operating hours. Please adjust your booking duration.")
             continue
 
         # Create the booking using filtering and lambda
@@ -170,79 +182,58 @@ def create_booking_flow(bookings, current_user, court_filter):
             if retry != 'y':
                 print("Booking creation canceled.")
                 break
+
+def join_waitlist_flow(waitlist, current_user, court_filter):
+    """Put the user on the waitlist for a court (or any court) within a time range."""
+    venue = court_filter.venue
+    court_id = users.get_user_input(f"Enter Court ID ({venue.court_label}, or {ANY_COURT} for any court): ").strip().upper()
+    day_index = parse_day_input(court_filter, users.get_user_input(f"{day_prompt(court_filter)}: ").strip())
+    if day_index is None:
+        print("Invalid day. Waitlist request canceled.")
+        return
+    earliest = court_filter.slots.normalize(users.get_user_input("Earliest start time (HH:MM AM/PM): "))
+    latest = court_filter.slots.normalize(users.get_user_input("Latest end time (HH:MM AM/PM): "))
+    try:
+        duration_hours = float(users.get_user_input("Enter Duration in hours (e.g., 1, 1.5): ").strip())
+    except ValueError:
+        duration_hours = 0
+    if earliest is None or latest is None:
+        print("Invalid time format. Waitlist request canceled.")
+        return
+    # A cancellation that frees a matching slot books it for the user (or notifies them at login)
+    waitlist.join(current_user, court_id, court_filter.day_names[day_index], earliest, latest, duration_hours)
+
+def view_waitlist_flow(waitlist, current_user):
+    """List the user's waitlist entries and optionally leave one."""
+    entries = waitlist.user_entries(current_user)
+    if not entries:
+        print("You are not on any waitlist.")
+        return
+    print("\nYour Waitlists:")
+    # 10. List Comprehensions: Iterating through the user's entries
+    [print(f"Entry {entry.entry_id}: Court {entry.court_id}, {entry.day}, {entry.start_time}-{entry.end_time}, {waitlist.slots.format_duration(entry.duration_hours)}") for entry in entries]
+    entry_input = users.get_user_input("Enter an entry number to leave it (or press Enter to return): ").strip()
+    if entry_input.isdigit():
+        _, error = waitlist.try_withdraw(int(entry_input), current_user)
+        print(error or f"You left waitlist entry {entry_input}.")
+
 def find_consecutive_slots(court_filter, day, court, start_time, duration):
     """Find consecutive available slots."""
-    slots_needed = int(duration * 2)  # Convert hours to 30-min slots
-    available_slots = []
-    
-    current_time = datetime.strptime(start_time, "%I:%M %p")
-    
-    for _ in range(slots_needed):
-        time_str = current_time.strftime("%I:%M %p")
-        if time_str not in court_filter.days[day][court]:
-            return []
-        available_slots.append(time_str)
-        current_time += timedelta(minutes=30)
-    
-    return available_slots
+    slots_needed = court_filter.slots.duration_slots(duration)  # Convert hours to slots
+    start = court_filter.slots.slot_index(start_time)
+    if start is None or slots_needed is None or not court_filter.grid.is_run_free(day, court, start, slots_needed):
+        return []
+    return list(court_filter.slots.times[start:start + slots_needed])
 
-def check_availability_recursive(court_filter, day, preferred_time, preferred_court, duration, 
-                               search_window=2, tried_times=None):
+def check_availability(court_filter, day, preferred_time, preferred_court, duration,
+                       search_window=SEARCH_WINDOW_HOURS, limit=SEARCH_RESULT_LIMIT):
     """
-    Recursively check availability and suggest alternatives.
-    Returns a list of dictionaries containing available slots.
+    Check availability and suggest the best alternatives.
+    Returns a ranked list of dictionaries containing available slots.
     """
-    if tried_times is None:
-        tried_times = set()
-        print(f"\nChecking availability for Court {preferred_court} at {preferred_time}...")
-    
-    # Base case: if we've searched beyond our window
-    time_dt = datetime.strptime(preferred_time, "%I:%M %p")
-    if any(abs((datetime.strptime(t, "%I:%M %p") - time_dt).total_seconds() / 3600) > search_window 
-           for t in tried_times):
-        return []
-    
-    # Add current time to tried times
-    tried_times.add(preferred_time)
-    
-    # Check if preferred slot is available
-    slots = find_consecutive_slots(court_filter, day, preferred_court, preferred_time, duration)
-    results = []
-    
-    if slots:
-        results.append({
-            'court': preferred_court,
-            'time': preferred_time,
-            'slots': slots,
-            'type': 'preferred' if preferred_time == slots[0] else 'alternative'
-        })
-    
-    # Check other courts at same time
-    available_courts = [c for c in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'] 
-                       if c != preferred_court and preferred_time in court_filter.days[day][c]]
-    
-    for court in available_courts:
-        alt_slots = find_consecutive_slots(court_filter, day, court, preferred_time, duration)
-        if alt_slots:
-            results.append({
-                'court': court,
-                'time': preferred_time,
-                'slots': alt_slots,
-                'type': 'alternative'
-            })
-    
-    # Calculate next times to check (both earlier and later)
-    next_time_later = (time_dt + timedelta(minutes=30)).strftime("%I:%M %p")
-    next_time_earlier = (time_dt - timedelta(minutes=30)).strftime("%I:%M %p")
-    
-    # Recursively check both directions
-    for next_time in [next_time_later, next_time_earlier]:
-        if next_time not in tried_times:
-            results.extend(check_availability_recursive(
-                court_filter, day, next_time, preferred_court, duration, 
-                search_window, tried_times))
-    
-    return results
+    print(f"\nChecking availability for Court {preferred_court} at {preferred_time}...")
+    return cached_alternative_slots(court_filter, day, preferred_time, preferred_court, duration,
+                                    search_window, limit)
 
 def display_availability_results(results):
     """Display availability results in a user-friendly format."""
@@ -250,11 +241,7 @@ def display_availability_results(results):
         print("\nNo available slots found within the search window.")
         return
         
-    # Sort results by time and preference
-    results.sort(key=lambda x: (
-        datetime.strptime(x['time'], "%I:%M %p"),
-        0 if x['type'] == 'preferred' else 1
-    ))
+    # Results arrive ranked best-first (closest time, then preferred court)
     
     print("\nAvailable slots found:")
     print("----------------------")
@@ -267,40 +254,35 @@ def display_availability_results(results):
         print(f"   Slots: {slot_times}")
 
 def check_court_availability(court_filter):
-    """Handle the court availability check with recursive search."""
+    """Handle the court availability check with the ranked availability search."""
     while True:
-        try:
-            day_input = users.get_user_input("Enter day (1-7, where 1 is Monday): ").strip()
-            if day_input.lower() == 'q':
-                return
-            day_num = int(day_input)
-            if day_num < 1 or day_num > 7:
-                raise ValueError
-            day_index = day_num - 1
+        day_input = users.get_user_input(f"{day_prompt(court_filter)}: ").strip()
+        if day_input.lower() == 'q':
+            return
+        day_index = parse_day_input(court_filter, day_input)
+        if day_index is not None:
             break
-        except ValueError:
-            print("Invalid day number. Please enter a number between 1 and 7.")
+        print(f"Invalid day. {day_prompt(court_filter)}.")
 
     while True:
         time_input = users.get_user_input("Enter preferred time (e.g., 2:00 PM): ").strip().upper()
         if time_input.lower() == 'q':
             return
-        try:
-            if not ("AM" in time_input or "PM" in time_input):
-                print("Time must include AM or PM.")
-                continue
-            parsed_time = datetime.strptime(time_input, "%I:%M %p")
-            preferred_time = parsed_time.strftime("%I:%M %p")
-            break
-        except ValueError:
+        if not ("AM" in time_input or "PM" in time_input):
+            print("Time must include AM or PM.")
+            continue
+        preferred_time = court_filter.slots.normalize(time_input)
+        if preferred_time is None:
             print("Invalid time format. Please enter time in HH:MM AM/PM format (e.g., 2:00 PM).")
+            continue
+        break
 
     while True:
-        court_id = users.get_user_input("Enter preferred court (A-H): ").strip().upper()
+        court_id = users.get_user_input(f"Enter preferred court ({court_filter.venue.court_label}): ").strip().upper()
         if court_id.lower() == 'q':
             return
-        if court_id not in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-            print("Invalid Court ID. Please enter a letter from A to H.")
+        if court_id not in court_filter.venue.courts:
+            print(f"Invalid Court ID. Please enter one of {court_filter.venue.court_label}.")
             continue
         break
 
@@ -312,15 +294,15 @@ def check_court_availability(court_filter):
             duration_hours = float(duration_input)
             if duration_hours <= 0:
                 raise ValueError
-            if (duration_hours * 2) != int(duration_hours * 2):
-                print("Duration must be in multiples of 30 minutes (e.g., 0.5, 1, 1.5).")
+            if court_filter.slots.duration_slots(duration_hours) is None:
+                print(f"Duration must be in multiples of {court_filter.slots.slot_minutes} minutes.")
                 continue
             break
         except ValueError:
-            print("Invalid duration. Please enter a positive number in 30-minute increments.")
+            print(f"Invalid duration. Please enter a positive number in {court_filter.slots.slot_minutes}-minute increments.")
 
-    # Call the recursive availability check
-    results = check_availability_recursive(
+    # Call the ranked availability search
+    results = check_availability(
         court_filter,
         day_index,
         preferred_time,
@@ -331,34 +313,69 @@ def check_court_availability(court_filter):
     # Display the results
     display_availability_results(results)
 
+def show_performance_stats(court_filter):
+    """Show the instrumentation report and optionally write it to the stats file."""
+    print("\n--- Performance Stats ---")
+    print(instrumentation.format_report())
+    cache = court_filter.search_cache.stats()
+    print(f"Availability cache: {cache['hits']} hits, {cache['misses']} misses ({cache['stale']} stale), "
+          f"hit rate {cache['hit_rate']:.1%}, {cache['entries']} entries")
+    if instrumentation.ENABLED or instrumentation.PROFILE_OPERATIONS:
+        save = users.get_user_input("Write stats to file? (y/n): ").strip().lower()
+        if save == 'y':
+            print(f"Stats written to {instrumentation.dump_stats()}.")
+
+def choose_venue():
+    """Ask which venue to manage when more than one is configured."""
+    names = venue_names()
+    if len(names) == 1:
+        return get_venue(names[0])
+    print("\n--- Venues ---")
+    for i, name in enumerate(names, 1):
+        print(f"{i}. {name}")
+    while True:
+        choice = users.get_user_input(f"Select a venue (1-{len(names)}): ").strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(names):
+            return get_venue(names[int(choice) - 1])
+        print("Invalid venue. Try again.")
+
 def main():
     """Main function to run the court booking application."""
     # 1. Separating Functions and Data: Load users separately
     users_data = users.load_users()  # 1. Separating functions and data
-    bookings = Bookings()  # 1. Separating functions and data
-    court_filter = CourtFilter()
-
-    court_filter.synchronize_with_bookings(bookings.bookings)
+    # Bookings and court availability come from the venue's startup snapshot when it is current
+    bookings, court_filter, snapshot = open_booking_state(venue=choose_venue())  # 1. Separating functions and data
+    waitlist = open_waitlist(bookings)  # Promotes waiters when a cancellation frees their slot
 
     while True:
         main_menu()
-        choice = users.get_user_input("Enter your choice (1-4): ").strip()  # 4. Passing functions as arguments
+        choice = users.get_user_input("Enter your choice (1-5): ").strip()  # 4. Passing functions as arguments
 
-        if choice in ['1', '2', '3', '4']:
+        if choice in ['1', '2', '3', '4', '5']:
             if choice == "1":
                 username = users.log_in(users_data)  # 2. Assigning a function to a variable
                 if username:
-                    user_actions(bookings, username, court_filter)
-                    # Reload bookings and court_filter after user actions using reducing
-                    bookings = Bookings()
-                    court_filter = CourtFilter()
-                    court_filter.synchronize_with_bookings(bookings.bookings)
+                    user_actions(bookings, username, court_filter, waitlist)
+                    # Reload bookings and court availability only if the files changed outside this process
+                    if bookings.reload_if_changed():
+                        court_filter.resynchronize(bookings.active_bookings())
+                    waitlist.reload_if_changed()
+                    if snapshot:
+                        snapshot.refresh(bookings, court_filter)  # Written in the background
             elif choice == "2":
                 users_data = users.sign_up(users_data)  # 2. Assigning a function to a variable
             elif choice == "3":
                 check_court_availability(court_filter)  # 2. Assigning a function to a variable
             elif choice == "4":
+                if snapshot:
+                    snapshot.refresh(bookings, court_filter)  # The writer thread finishes before exit
                 users.quit_action()  # 2. Assigning a function to a variable
+            elif choice == "5":
+                admin = users.log_in(users_data)
+                if admin in config.ADMIN_USERS:
+                    show_performance_stats(court_filter)
+                elif admin:
+                    print("\nPerformance stats are only available to administrators (config.ADMIN_USERS).")
             
         else:
             print("\nInvalid option. Try again.")  # 7. Filtering
@@ -0,0 +1,128 @@
+# startup_snapshot.py
+#
+# Binary snapshot of the parsed booking state (bookings, indexes and the availability grid), saved
+# next to the data files as data/bookings.snapshot. At startup it is used instead of parsing the CSVs
+# when it matches the source files: first by (mtime, size), then, if only those differ, by content hash.
+# A stale snapshot is rewritten in a background thread once the state has been rebuilt.
+
+import os
+import pickle
+import hashlib
+import threading
+import config
+from bookings import Bookings
+from filter_courts import CourtFilter
+from storage import create_booking_store
+from fsck import startup_check
+from venues import get_venue
+
+SNAPSHOT_SUFFIX = ".snapshot"
+# Bump when the pickled state changes shape; older snapshots are then ignored
+SNAPSHOT_VERSION = 2
+
+
+def hash_files(paths):
+    """Return a BLAKE2 digest of the files' contents (missing files hash as empty)."""
+    digest = hashlib.blake2b()
+    for path in paths:
+        digest.update(path.encode() + b"\0")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StartupSnapshot:
+    def __init__(self, store, path):
+        """Initialize the snapshot of a booking store's parsed state."""
+        self.store = store
+        self.path = path
+        self.writer = None  # Background writer thread, if one is running
+
+    def load(self):
+        """Return the saved state if it matches the source files, otherwise None."""
+        try:
+            with open(self.path, "rb") as file:
+                header = pickle.load(file)
+                if header.get("version") != SNAPSHOT_VERSION:
+                    return None
+                if header["signature"] != self.store.signature():
+                    # Touched or copied files keep their contents; only a real change invalidates the snapshot
+                    if header["hash"] != hash_files(self.store.source_paths()):
+                        return None
+                state = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError):
+            return None
+        state["bookings_state"]["signature"] = self.store.signature()
+        return state
+
+    def is_current(self, signature):
+        """Check whether the saved snapshot was taken at the given source signature."""
+        try:
+            with open(self.path, "rb") as file:
+                return pickle.load(file).get("signature") == signature
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+
+    def save(self, payload, signature):
+        """Write a pickled state, unless the source files changed since it was captured."""
+        source_hash = hash_files(self.store.source_paths())
+        if self.store.signature() != signature:
+            return False  # Another change landed meanwhile; the next refresh will capture it
+        header = {"version": SNAPSHOT_VERSION, "signature": signature, "hash": source_hash}
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        return True
+
+    def save_in_background(self, bookings, court_filter):
+        """Capture the current state now and write it from a background thread."""
+        state = {"bookings_state": bookings.snapshot_state(), "grid_state": court_filter.grid_state()}
+        # Pickling here keeps the copy consistent; hashing and writing happen off the main thread
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self.wait()
+        self.writer = threading.Thread(target=self.save, args=(payload, bookings.loaded_signature))
+        self.writer.start()
+        return self.writer
+
+    def refresh(self, bookings, court_filter):
+        """Rewrite the snapshot in the background if it no longer matches the loaded state."""
+        if not self.is_current(bookings.loaded_signature):
+            self.save_in_background(bookings, court_filter)
+
+    def wait(self):
+        """Wait for a background write to finish."""
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+
+def open_booking_state(file_path=None, venue=None):
+    """
+    Return (bookings, court_filter, snapshot) for a venue, with the grid synchronized and subscribed to changes.
+    The state comes from the startup snapshot when it is current; otherwise the data files are parsed
+    and the snapshot is rewritten in the background. snapshot is None when snapshots are off or unused.
+    """
+    venue = venue or get_venue()
+    file_path = file_path or venue.bookings_path
+    store = create_booking_store(file_path, db_path=venue.sqlite_path)
+    snapshot = None
+    if config.STARTUP_SNAPSHOT and not store.indexed:
+        snapshot = StartupSnapshot(store, os.path.splitext(file_path)[0] + SNAPSHOT_SUFFIX)
+    state = snapshot.load() if snapshot else None
+
+    bookings = Bookings(file_path, store=store, state=state["bookings_state"] if state else None, venue=venue)
+    if state is None:
+        startup_check(bookings)  # A current snapshot holds bookings that were checked when they were parsed
+    court_filter = CourtFilter(venue=venue)
+    if state is None or not court_filter.restore_grid(state["grid_state"]):
+        court_filter.synchronize_with_bookings(bookings.active_bookings())
+        if snapshot:
+            snapshot.save_in_background(bookings, court_filter)
+    bookings.subscribe(court_filter.apply_booking_event)  # 4. Passing functions as arguments
+    return bookings, court_filter, snapshot
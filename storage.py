@@ -0,0 +1,983 @@
+# storage.py
+
+import io
+import os
+import csv
+import dbm
+import math
+import sqlite3
+import argparse
+import itertools
+from datetime import date
+from contextlib import contextmanager, nullcontext
+from collections import namedtuple
+from collections.abc import Mapping
+import config
+import instrumentation
+from credentials import hash_password, is_password_hash
+from calendar_days import parse_date, week_key, booking_week_key, horizon_weeks, weeks_between, date_in_week
+from availability_grid import DAY_INDEX
+
+try:
+    import fcntl  # Locks the shared dbm user store; not available on Windows
+except ImportError:
+    fcntl = None
+
+BOOKING_FIELDS = ['booking_id', 'court_id', 'day', 'start_time', 'end_time', 'duration', 'status', 'username']
+
+# Define the Booking namedtuple with end_time
+Booking = namedtuple('Booking', BOOKING_FIELDS)
+
+# Journal of changes made since the last snapshot (data/bookings.journal)
+JOURNAL_SUFFIX = ".journal"
+# Fold the journal back into the CSV snapshot once it grows past this size
+JOURNAL_COMPACT_BYTES = 256 * 1024
+# Highest booking_id ever issued (data/bookings.seq), written with each snapshot
+SEQUENCE_SUFFIX = ".seq"
+# Bookings that are no longer active (canceled, or imported as completed, expired or no-show) are moved
+# to data/bookings_history.csv when archiving. Active bookings stay: weekday bookings carry no date to
+# expire on, and calendar-date bookings are kept out of the hot files by their week partitions instead.
+HISTORY_SUFFIX = "_history.csv"
+# Statuses that keep a booking in the hot snapshot file
+LIVE_STATUSES = ('active',)
+
+
+def row_to_booking(row):
+    """Build a normalized Booking from a CSV row dictionary."""
+    return fields_to_booking([row[field] for field in BOOKING_FIELDS])
+
+
+def fields_to_booking(fields):
+    """Build a normalized Booking from raw CSV fields in BOOKING_FIELDS order."""
+    booking_id, court_id, day, start_time, end_time, duration, status, username = fields
+    username = username.strip()
+    return Booking(
+        booking_id=int(booking_id),
+        court_id=court_id.strip().upper(),
+        day=day.strip().capitalize(),
+        start_time=start_time.strip().upper(),
+        end_time=end_time.strip().upper(),
+        duration=duration.strip(),
+        status=status.strip().lower(),
+        username=username.capitalize() if username else None
+    )
+
+
+def parse_duration_hours(duration):
+    """Parse a stored duration such as '1.5 hours', returning None if it is not a finite number of hours."""
+    try:
+        hours = float(duration.split()[0])
+    except (IndexError, ValueError):
+        return None
+    return hours if math.isfinite(hours) else None
+
+
+# Problems BookingRowValidator finds in a stored booking
+BAD_COURT, BAD_DAY, BAD_TIME, BAD_DURATION = 'bad_court', 'bad_day', 'bad_time', 'bad_duration'
+
+
+# Shared by the importer and fsck: both check stored rows against a venue's courts and slots
+class BookingRowValidator:
+    def __init__(self, venue):
+        """Validate bookings against a venue's courts and slots, remembering the days and durations already seen."""
+        self.venue = venue
+        self.courts = set(venue.courts)
+        self.slots = venue.slots
+        self.valid_days = {}       # day -> is it a weekday name or a date
+        self.duration_slots = {}   # duration text -> slot count (or None)
+
+    def check(self, booking):
+        """
+        Return (start slot, end slot, None, None) for a well-formed booking, or (start, end, problem, reason).
+        start and end are None unless the times are a range of the venue's slots; a duration that does not
+        match them is the only problem reported with both set.
+        """
+        if booking.court_id not in self.courts:
+            return None, None, BAD_COURT, f"unknown court {booking.court_id}"
+        valid_day = self.valid_days.get(booking.day)
+        if valid_day is None:
+            valid_day = self.valid_days[booking.day] = booking.day in DAY_INDEX or parse_date(booking.day) is not None
+        if not valid_day:
+            return None, None, BAD_DAY, f"invalid day {booking.day}"
+        start, end = self.slots.slot_index(booking.start_time), self.slots.boundary_index(booking.end_time)
+        if start is None or end is None or end <= start:
+            return None, None, BAD_TIME, f"{booking.start_time}-{booking.end_time} is not a range of {self.venue.name} slots"
+        if booking.duration not in self.duration_slots:
+            duration_hours = parse_duration_hours(booking.duration)
+            self.duration_slots[booking.duration] = None if duration_hours is None else self.slots.duration_slots(duration_hours)
+        if self.duration_slots[booking.duration] != end - start:
+            return start, end, BAD_DURATION, f"duration {booking.duration or '(empty)'} does not match {booking.start_time}-{booking.end_time}"
+        return start, end, None, None
+
+
+# How each filterable field is normalized before comparing
+FILTER_NORMALIZERS = {
+    'status': lambda v: v.strip().lower(),
+    'day': lambda v: v.strip().capitalize(),
+    'court_id': lambda v: v.strip().upper(),
+    'username': lambda v: v.strip().lower(),
+}
+
+
+def as_value_set(value, normalize):
+    """Turn a filter value (a single value or a collection) into a set of normalized values."""
+    values = [value] if isinstance(value, str) else value
+    return {normalize(v) for v in values}
+
+
+def iter_bookings(file_path, status=None, day=None, court_id=None, username=None, exclude_status=None):
+    """
+    Stream bookings from a CSV snapshot.
+    Filters (a value or a collection of values) are checked against the raw fields, so rows that are
+    filtered out are never turned into Booking objects.
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "r", newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [header.index(field) for field in BOOKING_FIELDS]
+        width = max(columns) + 1
+        # (column, accepted values, normalizer) for each requested filter
+        pushdown = [
+            (columns[BOOKING_FIELDS.index(field)], as_value_set(value, FILTER_NORMALIZERS[field]), FILTER_NORMALIZERS[field])
+            for field, value in [('status', status), ('day', day), ('court_id', court_id), ('username', username)]
+            if value is not None
+        ]  # 10. List Comprehensions
+        excluded = as_value_set(exclude_status or (), str.lower)
+        status_column = columns[BOOKING_FIELDS.index('status')]
+        required = columns[:5]  # booking_id, court_id, day, start_time and end_time must be present
+        for row in reader:
+            if len(row) < width or not all(row[column].strip() for column in required):
+                continue
+            # 7. Filtering: reject on the raw fields before building anything
+            if any(normalize(row[column]) not in accepted for column, accepted, normalize in pushdown):
+                continue
+            if excluded and row[status_column].strip().lower() in excluded:
+                continue
+            try:
+                yield fields_to_booking([row[column] for column in columns])
+            except ValueError:
+                continue  # Non-numeric booking_id
+
+
+def booking_to_row(booking):
+    """Convert a Booking to a list of CSV fields."""
+    return [
+        booking.booking_id,
+        booking.court_id,
+        booking.day,
+        booking.start_time,
+        booking.end_time,
+        booking.duration,
+        booking.status,
+        booking.username if booking.username else ""
+    ]
+
+
+def file_signature(path):
+    """Return (mtime_ns, size) of a file, or (None, None) if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return (None, None)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def write_counter(path, value):
+    """Write a counter file atomically, so a crash leaves either the old or the new value."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        file.write(str(value))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+# 1. Separating Functions and Data:
+# Booking stores only persist bookings. Stores with `indexed = True` also answer the
+# queries Bookings needs (conflicts, per-user listings, lookups) without a full load.
+class CsvBookingStore:
+    indexed = False
+
+    def __init__(self, file_path, journal_mode=True, live_only=False):
+        """Initialize a CSV snapshot store with an optional append-only journal."""
+        self.file_path = file_path
+        # In journal mode each change is appended to a journal next to the CSV snapshot
+        self.journal_mode = journal_mode
+        self.journal_path = os.path.splitext(file_path)[0] + JOURNAL_SUFFIX
+        self.sequence_path = os.path.splitext(file_path)[0] + SEQUENCE_SUFFIX
+        self.history_path = os.path.splitext(file_path)[0] + HISTORY_SUFFIX
+        # Live-only stores load just the live rows and archive the rest whenever the snapshot is rewritten
+        self.live_only = live_only
+        self.archived_ids = set()
+        self.history_ids = None  # IDs in the history file, read on the first archive
+        self.journal_checked = False  # Whether the journal's tail was checked for a torn record
+        self.pending = None  # Records buffered by grouped()
+
+    def load(self, container=list):
+        """Load bookings into `container` (a list by default) from the CSV snapshot and replay the journal on top."""
+        status = LIVE_STATUSES if self.live_only else None
+        return self.replay_journal(container(iter_bookings(self.file_path, status=status)))
+
+    def read_journal(self):
+        """Return the journal as ({booking_id: created Booking}, {booking_id: latest status})."""
+        creates, statuses = {}, {}
+        if not os.path.exists(self.journal_path):
+            return creates, statuses
+        with open(self.journal_path, "r", newline='') as file:
+            text = file.read()
+        # Only records ending in a newline were written completely; a torn last record is ignored
+        for record in csv.reader(io.StringIO(text[:text.rfind("\n") + 1])):
+            try:
+                if record[0] == 'create' and len(record) == len(BOOKING_FIELDS) + 1:
+                    # Replaying a create twice (e.g. after an interrupted compaction) overwrites it
+                    booking = fields_to_booking(record[1:])
+                    creates[booking.booking_id] = booking
+                    statuses.pop(booking.booking_id, None)
+                elif record[0] == 'status' and len(record) == 3:
+                    statuses[int(record[1])] = record[2]
+            except (IndexError, ValueError):
+                continue  # Skip a malformed record
+        return creates, statuses
+
+    def replay_journal(self, bookings):
+        """Apply journal records (create or status change) to the loaded snapshot."""
+        creates, statuses = self.read_journal()
+        if not creates and not statuses:
+            return bookings
+        positions = {booking.booking_id: i for i, booking in enumerate(bookings)}
+        for booking_id, booking in creates.items():
+            if booking_id in positions:
+                bookings[positions[booking_id]] = booking
+            else:
+                positions[booking_id] = len(bookings)
+                bookings.append(booking)
+        for booking_id, status in statuses.items():
+            position = positions.get(booking_id)
+            if position is not None:
+                bookings[position] = bookings[position]._replace(status=status)
+        return bookings
+
+    def truncate_torn_record(self):
+        """Cut a torn last record (one without its newline, left by a crash) off the journal."""
+        try:
+            file = open(self.journal_path, "r+b")
+        except FileNotFoundError:
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(4096, position)
+                file.seek(position - step)
+                block = file.read(step)
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position < end:
+                file.truncate(position)
+                file.flush()
+                os.fsync(file.fileno())
+
+    @instrumentation.instrument("append_journal")
+    def append_journal(self, records):
+        """Append records to the journal with a single write and fsync. Returns the journal size in bytes."""
+        if not self.journal_checked:
+            # Appending after a torn record would glue the new record onto it, and both would be skipped
+            self.truncate_torn_record()
+            self.journal_checked = True
+        with open(self.journal_path, "a", newline='') as file:
+            size_before = file.tell()
+            csv.writer(file).writerows(records)
+            file.flush()
+            os.fsync(file.fileno())
+            if instrumentation.ENABLED:
+                instrumentation.count_bytes("append_journal", file.tell() - size_before)
+            return file.tell()
+
+    def record_changes(self, records, bookings, max_booking_id=None):
+        """Persist a group of changes, through the journal when journal mode is on."""
+        if self.pending is not None:
+            # Inside grouped(): written once when the group ends
+            self.pending.extend(records)
+            self.pending_state = (bookings, max_booking_id)
+            return
+        if not self.journal_mode:
+            self.save_all(bookings, max_booking_id)
+        elif self.append_journal(records) > JOURNAL_COMPACT_BYTES:
+            self.save_all(bookings, max_booking_id)  # Compaction: fold the journal back into the snapshot
+
+    @contextmanager
+    def grouped(self):
+        """Buffer the changes recorded inside the block and persist them with one write (and fsync) at its end."""
+        self.pending = []
+        try:
+            yield
+        finally:
+            records, self.pending = self.pending, None
+            if records:
+                self.record_changes(records, *self.pending_state)
+
+    def record_create(self, booking, bookings, max_booking_id=None):
+        """Persist a newly created booking."""
+        self.record_creates([booking], bookings, max_booking_id)
+
+    def record_creates(self, new_bookings, bookings, max_booking_id=None):
+        """Persist newly created bookings as one journal write."""
+        self.record_changes([['create'] + booking_to_row(booking) for booking in new_bookings], bookings, max_booking_id)
+
+    def record_status(self, booking_id, status, bookings, max_booking_id=None):
+        """Persist a status change for a booking."""
+        self.record_changes([['status', booking_id, status]], bookings, max_booking_id)
+
+    def append_history(self, bookings):
+        """
+        Append bookings to the history file, creating it with a header. Bookings already in the file are
+        skipped, so archiving again after a crash (before the snapshot was replaced) adds no duplicates.
+        Returns the highest booking_id passed in.
+        """
+        new_file = not os.path.exists(self.history_path) or os.path.getsize(self.history_path) == 0
+        if self.history_ids is None:
+            self.history_ids = {booking.booking_id for booking in iter_bookings(self.history_path)}
+        highest = 0
+        with open(self.history_path, "a", newline='') as file:
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(BOOKING_FIELDS)
+            for booking in bookings:
+                highest = max(highest, booking.booking_id)
+                if booking.booking_id in self.history_ids:
+                    continue
+                writer.writerow(booking_to_row(booking))
+                self.history_ids.add(booking.booking_id)
+                self.archived_ids.add(booking.booking_id)
+            file.flush()
+            os.fsync(file.fileno())
+        return highest
+
+    def load_max_booking_id(self):
+        """Return the persisted highest booking_id (0 if none was saved yet)."""
+        try:
+            with open(self.sequence_path, "r") as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            if self.live_only:
+                # No counter saved yet: IDs of rows that were not loaded must still never be reissued
+                return max((booking.booking_id for path in (self.file_path, self.history_path)
+                            for booking in iter_bookings(path)), default=0)
+            return 0
+        except ValueError:
+            return 0
+
+    def can_change(self, day):
+        """Check whether bookings on a day may still be changed (always, for a single snapshot)."""
+        return True
+
+    def signature(self):
+        """Return (mtime, size) of the snapshot and journal, used to detect outside changes."""
+        return file_signature(self.file_path) + file_signature(self.journal_path)
+
+    def source_paths(self):
+        """Return the files the loaded bookings are read from."""
+        return [self.file_path, self.journal_path]
+
+    def snapshot_state(self):
+        """Return the in-memory state a startup snapshot must carry besides the bookings."""
+        return {"archived_ids": self.archived_ids}
+
+    def restore_state(self, state):
+        """Restore the state saved by snapshot_state()."""
+        self.archived_ids = set(state["archived_ids"])
+
+    @instrumentation.instrument("save_bookings")
+    def save_all(self, bookings, max_booking_id=None):
+        """Write every booking to the CSV snapshot (plus the ID counter) and clear the journal."""
+        if self.live_only:
+            # Snapshot rows that were never loaded and bookings that stopped being live go to the history
+            # file, streamed so the history never has to fit in memory
+            finished = (booking for booking in bookings
+                        if booking.status not in LIVE_STATUSES and booking.booking_id not in self.archived_ids)
+            highest = self.append_history(itertools.chain(
+                iter_bookings(self.file_path, exclude_status=LIVE_STATUSES), finished))
+            bookings = [booking for booking in bookings if booking.status in LIVE_STATUSES]
+            max_booking_id = max(max_booking_id or 0, highest)
+        if max_booking_id is not None:
+            # The journal's create records carry their IDs, so the counter only needs saving with snapshots;
+            # the saved value is read before it is replaced, so the counter never goes back
+            write_counter(self.sequence_path, max(max_booking_id, self.load_max_booking_id()))
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "w", newline='') as file:
+            writer = csv.writer(file)
+            # Write the header
+            writer.writerow(BOOKING_FIELDS)
+            # Write each booking
+            writer.writerows(booking_to_row(booking) for booking in bookings)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.file_path)  # Readers never see a half-written snapshot
+        if instrumentation.ENABLED:
+            instrumentation.count_bytes("save_bookings", os.path.getsize(self.file_path))
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+
+class SqliteBookingStore:
+    indexed = True
+
+    def __init__(self, db_path):
+        """Open (and create if needed) the bookings table in a SQLite database."""
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.in_group = False  # Inside grouped(), writes share one transaction
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS bookings (
+                    booking_id INTEGER NOT NULL,
+                    court_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    duration TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    username TEXT,
+                    username_key TEXT,
+                    start_key INTEGER NOT NULL,
+                    end_key INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_bookings_court_day_status ON bookings (court_id, day, status);
+                CREATE INDEX IF NOT EXISTS idx_bookings_username ON bookings (username_key);
+                CREATE INDEX IF NOT EXISTS idx_bookings_booking_id ON bookings (booking_id);
+            """)
+
+    def signature(self):
+        """Return (mtime, size) of the database and its write-ahead log."""
+        return file_signature(self.db_path) + file_signature(self.db_path + "-wal")
+
+    def rows_to_bookings(self, rows):
+        """Convert selected rows to Booking tuples."""
+        return [Booking(*row) for row in rows]  # 10. List Comprehensions
+
+    def load(self, container=list):
+        """Load every booking into `container` (only used by callers that need the full history)."""
+        return container(Booking(*row) for row in self.connection.execute(
+            f"SELECT {', '.join(BOOKING_FIELDS)} FROM bookings ORDER BY booking_id"))
+
+    def active_bookings(self):
+        """Return all active bookings."""
+        return self.rows_to_bookings(self.connection.execute(
+            f"SELECT {', '.join(BOOKING_FIELDS)} FROM bookings WHERE status = 'active'"))
+
+    def find_conflict(self, court_id, day, start_key, end_key):
+        """Return the booking_id of an active booking overlapping [start_key, end_key), or None."""
+        row = self.connection.execute(
+            "SELECT booking_id FROM bookings WHERE court_id = ? AND day = ? AND status = 'active'"
+            " AND start_key < ? AND end_key > ? LIMIT 1",
+            (court_id, day, end_key, start_key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def user_bookings(self, username):
+        """Return the active bookings of a user."""
+        return self.rows_to_bookings(self.connection.execute(
+            f"SELECT {', '.join(BOOKING_FIELDS)} FROM bookings WHERE username_key = ? AND status = 'active'"
+            " ORDER BY booking_id",
+            (username.lower(),)
+        ))
+
+    def find_user_booking(self, booking_id, username):
+        """Return the active booking with this id owned by the user, or None."""
+        rows = self.rows_to_bookings(self.connection.execute(
+            f"SELECT {', '.join(BOOKING_FIELDS)} FROM bookings WHERE booking_id = ? AND username_key = ?"
+            " AND status = 'active' LIMIT 1",
+            (booking_id, username.lower())
+        ))
+        return rows[0] if rows else None
+
+    def max_booking_id(self):
+        """Return the highest booking_id in use, or 0."""
+        return self.connection.execute("SELECT MAX(booking_id) FROM bookings").fetchone()[0] or 0
+
+    def duplicate_ids(self):
+        """Return (booking_id, count) for every booking_id stored more than once."""
+        return self.connection.execute(
+            "SELECT booking_id, COUNT(*) FROM bookings GROUP BY booking_id HAVING COUNT(*) > 1 ORDER BY booking_id"
+        ).fetchall()
+
+    def overlapping_bookings(self):
+        """Return (booking_id, other booking_id, court_id, day) for every pair of overlapping active bookings."""
+        return self.connection.execute(
+            "SELECT b.booking_id, a.booking_id, a.court_id, a.day FROM bookings AS a"
+            " JOIN bookings AS b ON b.court_id = a.court_id AND b.day = a.day AND b.status = 'active'"
+            " AND b.rowid > a.rowid AND b.start_key < a.end_key AND b.end_key > a.start_key"
+            " WHERE a.status = 'active' ORDER BY b.booking_id, a.booking_id"
+        ).fetchall()
+
+    def insert(self, booking, start_key, end_key):
+        """Insert a booking along with its interval keys."""
+        self.insert_all([(booking, start_key, end_key)])
+
+    def transaction(self):
+        """Return a context committing one change, or nothing inside grouped() (the group commits once)."""
+        return nullcontext() if self.in_group else self.connection
+
+    @contextmanager
+    def grouped(self):
+        """Commit every change made inside the block as a single transaction."""
+        self.in_group = True
+        try:
+            with self.connection:
+                yield
+        finally:
+            self.in_group = False
+
+    def insert_all(self, keyed_bookings):
+        """Insert (booking, start_key, end_key) tuples in a single transaction."""
+        with self.transaction():
+            self.insert_many(keyed_bookings)
+
+    def insert_many(self, keyed_bookings):
+        """Insert (booking, start_key, end_key) tuples without committing."""
+        self.connection.executemany(
+            "INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tuple(booking) + (booking.username.lower() if booking.username else None, start_key, end_key)
+             for booking, start_key, end_key in keyed_bookings)
+        )
+
+    def set_status(self, booking_id, username, status):
+        """Change the status of a user's booking."""
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE bookings SET status = ? WHERE booking_id = ? AND username_key = ?",
+                (status, booking_id, username.lower())
+            )
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+
+# 1. Separating Functions and Data:
+# Calendar-date bookings are stored in one CSV snapshot + journal per ISO week (data/bookings/2026-W42.csv).
+# Only the weeks of the booking horizon are loaded; weeks before the current one are immutable, so they
+# are never rewritten and never opened unless a query asks for them.
+class PartitionedBookingStore:
+    indexed = False
+
+    def __init__(self, directory, journal_mode=True, today=None):
+        """Initialize a store of per-week partitions in `directory`."""
+        self.directory = directory
+        self.journal_mode = journal_mode
+        self.today = today
+        self.sequence_path = os.path.join(directory, "bookings" + SEQUENCE_SUFFIX)
+        self.partitions = {}   # week key -> CsvBookingStore
+        self.week_of_id = {}   # booking_id -> week key, for the loaded weeks
+        self.loaded_weeks = []
+        self.pending = None    # week key -> records buffered by grouped()
+        os.makedirs(directory, exist_ok=True)
+
+    def partition(self, key):
+        """Return the store of one week's partition."""
+        if key not in self.partitions:
+            self.partitions[key] = CsvBookingStore(os.path.join(self.directory, key + ".csv"), self.journal_mode)
+        return self.partitions[key]
+
+    def is_immutable(self, key):
+        """Check whether a week lies before the current one (keys sort chronologically)."""
+        return key < week_key(self.today or date.today())
+
+    def can_change(self, day):
+        """Check whether bookings on a day may still be changed, i.e. its week is not immutable."""
+        key = booking_week_key(day)
+        return key is not None and not self.is_immutable(key)
+
+    def stored_weeks(self):
+        """Return the keys of every partition on disk, oldest first."""
+        return sorted(name[:-len(".csv")] for name in os.listdir(self.directory) if name.endswith(".csv"))
+
+    def load(self, container=list):
+        """Load the bookings of the weeks the booking horizon touches."""
+        self.loaded_weeks = horizon_weeks(self.today)
+        bookings = container()
+        self.week_of_id = {}
+        for key in self.loaded_weeks:
+            for booking in self.partition(key).load():
+                self.week_of_id[booking.booking_id] = key
+                bookings.append(booking)
+        return bookings
+
+    def iter_range(self, start, end, **filters):
+        """Stream the bookings dated start..end (inclusive) from only the partitions they fall in."""
+        low, high = start.isoformat(), end.isoformat()
+        for key in weeks_between(start, end):
+            partition = self.partition(key)
+            if not os.path.exists(partition.file_path):
+                continue
+            # Immutable weeks have been compacted, so the snapshot alone is complete
+            if self.is_immutable(key) and not os.path.exists(partition.journal_path):
+                bookings = iter_bookings(partition.file_path, **filters)
+            else:
+                bookings = (booking for booking in partition.load() if matches_filters(booking, filters))
+            for booking in bookings:
+                if low <= booking.day <= high:
+                    yield booking
+
+    def week_bookings(self, key, bookings):
+        """Return the bookings that belong to one week's partition."""
+        return [booking for booking in bookings if booking_week_key(booking.day) == key]
+
+    def record_changes(self, key, records, bookings, max_booking_id=None):
+        """Persist a group of changes to one week's partition."""
+        if key is None or self.is_immutable(key):
+            raise ValueError(f"Bookings in week {key} cannot be changed.")
+        if key not in self.loaded_weeks:
+            # A week that entered the horizon after loading (the date changed); it had no bookings then
+            self.loaded_weeks = sorted(self.loaded_weeks + [key])
+        if self.pending is not None:
+            # Inside grouped(): written once per week when the group ends
+            self.pending.setdefault(key, []).extend(records)
+            self.pending_state = (bookings, max_booking_id)
+            return
+        partition = self.partition(key)
+        if not self.journal_mode or partition.append_journal(records) > JOURNAL_COMPACT_BYTES:
+            self.save_week(key, bookings, max_booking_id)
+
+    @contextmanager
+    def grouped(self):
+        """Buffer the changes recorded inside the block and persist them with one write per week at its end."""
+        self.pending = {}
+        try:
+            yield
+        finally:
+            weeks, self.pending = self.pending, None
+            for key, records in weeks.items():
+                self.record_changes(key, records, *self.pending_state)
+
+    def record_creates(self, new_bookings, bookings, max_booking_id=None):
+        """Persist newly created bookings, one journal write per week touched."""
+        weeks = {}
+        for booking in new_bookings:
+            weeks.setdefault(booking_week_key(booking.day), []).append(['create'] + booking_to_row(booking))
+            self.week_of_id[booking.booking_id] = booking_week_key(booking.day)
+        for key, records in weeks.items():
+            self.record_changes(key, records, bookings, max_booking_id)
+
+    def record_status(self, booking_id, status, bookings, max_booking_id=None):
+        """Persist a status change for a booking."""
+        self.record_changes(self.week_of_id.get(booking_id), [['status', booking_id, status]], bookings, max_booking_id)
+
+    def save_week(self, key, bookings, max_booking_id=None):
+        """Rewrite one week's snapshot from the loaded bookings."""
+        self.partition(key).save_all(self.week_bookings(key, bookings))
+        self.save_max_booking_id(max_booking_id)
+
+    def save_all(self, bookings, max_booking_id=None):
+        """Rewrite the snapshot of every loaded week that is still mutable."""
+        for key in self.loaded_weeks:
+            partition = self.partition(key)
+            week_bookings = self.week_bookings(key, bookings)
+            # Weeks with no bookings yet are left without a file
+            if not self.is_immutable(key) and (week_bookings or os.path.exists(partition.file_path)):
+                partition.save_all(week_bookings)
+        self.save_max_booking_id(max_booking_id)
+
+    def save_max_booking_id(self, max_booking_id):
+        """Persist the highest booking_id ever issued, shared by all partitions."""
+        if max_booking_id is not None:
+            write_counter(self.sequence_path, max(max_booking_id, self.load_max_booking_id()))
+
+    def load_max_booking_id(self):
+        """Return the persisted highest booking_id, scanning the partitions if none was saved yet."""
+        try:
+            with open(self.sequence_path, "r") as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            return max((booking.booking_id for key in self.stored_weeks() for booking in self.partition(key).load()),
+                       default=0)
+        except ValueError:
+            return 0
+
+    def signature(self):
+        """Return the signatures of the horizon's weeks, used to detect outside changes (or a rolled horizon)."""
+        return tuple((key,) + self.partition(key).signature() for key in horizon_weeks(self.today))
+
+    def source_paths(self):
+        """Return the files the loaded bookings are read from."""
+        return [path for key in horizon_weeks(self.today) for path in self.partition(key).source_paths()]
+
+    def snapshot_state(self):
+        """Return the in-memory state a startup snapshot must carry besides the bookings."""
+        return {"week_of_id": self.week_of_id, "loaded_weeks": self.loaded_weeks}
+
+    def restore_state(self, state):
+        """Restore the state saved by snapshot_state()."""
+        self.week_of_id = dict(state["week_of_id"])
+        self.loaded_weeks = list(state["loaded_weeks"])
+
+
+def matches_filters(booking, filters):
+    """Check a loaded booking against iter_bookings-style filters."""
+    return all(
+        FILTER_NORMALIZERS[field](getattr(booking, field) or '') in as_value_set(value, FILTER_NORMALIZERS[field])
+        for field, value in filters.items() if value is not None
+    )
+
+
+def partition_bookings(file_path, directory, today=None):
+    """
+    Move the bookings of a CSV snapshot (and journal) into per-week partitions. Undated bookings are
+    given the date of their weekday in the current ISO week. Returns the number of bookings moved.
+    """
+    source = CsvBookingStore(file_path)
+    store = PartitionedBookingStore(directory, today=today)
+    weeks = {}
+    max_booking_id = source.load_max_booking_id()
+    for booking in list(iter_bookings(source.history_path)) + source.load():
+        if booking_week_key(booking.day) is None:
+            booking = booking._replace(day=date_in_week(booking.day, today))
+        weeks.setdefault(booking_week_key(booking.day), []).append(booking)
+        max_booking_id = max(max_booking_id, booking.booking_id)
+    for key, bookings in weeks.items():
+        partition = store.partition(key)
+        existing = partition.load()
+        # Re-running the migration does not duplicate bookings that were already moved
+        existing_ids = {booking.booking_id for booking in existing}
+        partition.save_all(existing + [booking for booking in bookings if booking.booking_id not in existing_ids])
+    store.save_max_booking_id(max_booking_id)
+    return sum(len(bookings) for bookings in weeks.values())
+
+
+def partitions_dir(file_path):
+    """Return the directory of the week partitions that replace a bookings CSV (data/bookings.csv -> data/bookings)."""
+    return os.path.splitext(file_path)[0]
+
+
+def create_booking_store(file_path, journal_mode=True, backend=None, live_only=None, db_path=None):
+    """Create the booking store selected by config.STORAGE_BACKEND (partitioned by week with CALENDAR_DATES)."""
+    if (backend or config.STORAGE_BACKEND) == "sqlite":
+        return SqliteBookingStore(db_path or config.SQLITE_DB_PATH)
+    if config.CALENDAR_DATES:
+        directory = partitions_dir(file_path)
+        if not os.path.isdir(directory) and os.path.exists(file_path):
+            partition_bookings(file_path, directory)  # First start with calendar dates
+        return PartitionedBookingStore(directory, journal_mode)
+    return CsvBookingStore(file_path, journal_mode, config.LIVE_BOOKINGS_ONLY if live_only is None else live_only)
+
+
+def archive_bookings(file_path):
+    """
+    Move every booking whose status is no longer live (canceled, or an imported completed, expired or
+    no-show) from the snapshot and journal into the history file; active bookings are never archived.
+    Only live rows and the journal are held in memory. Returns (live, archived) counts.
+    """
+    store = CsvBookingStore(file_path, live_only=True)
+    bookings = store.load()
+    store.save_all(bookings, store.load_max_booking_id())
+    return sum(booking.status in LIVE_STATUSES for booking in bookings), len(store.archived_ids)
+
+
+# User stores: load_users returns a mapping of USERNAME -> password hash
+# (users.csv files written before hashing may still hold plain-text passwords)
+class CsvUserStore:
+    def __init__(self, file_path):
+        """Initialize a CSV-backed user store."""
+        self.file_path = file_path
+
+    def load_users(self):
+        """Load all users into a dictionary."""
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r", newline='') as file:
+                reader = csv.DictReader(file)
+                # 10. List Comprehension: Creating a dictionary of users
+                return {row['username'].strip().upper(): row['password'].strip() for row in reader if row['username'].strip()}
+        return {}
+
+    def save_user(self, username, password):
+        """Append a new user to the CSV file."""
+        with open(self.file_path, "a", newline='') as file:
+            csv.writer(file).writerow([username.upper(), password])
+
+
+class SqliteUserMapping(Mapping):
+    """Read-only mapping of USERNAME -> password answered by indexed lookups."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getitem__(self, username):
+        row = self.connection.execute(
+            "SELECT password FROM users WHERE username = ?", (username.upper(),)).fetchone()
+        if row is None:
+            raise KeyError(username)
+        return row[0]
+
+    def __contains__(self, username):
+        return self.connection.execute(
+            "SELECT 1 FROM users WHERE username = ?", (username.upper(),)).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.connection.execute("SELECT username FROM users"))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+class SqliteUserStore:
+    def __init__(self, db_path):
+        """Open (and create if needed) the users table in a SQLite database."""
+        self.connection = sqlite3.connect(db_path)
+        with self.connection:
+            # The primary key doubles as the username index
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password TEXT NOT NULL)")
+
+    def load_users(self):
+        """Return a lazy mapping; nothing is read until a username is looked up."""
+        return SqliteUserMapping(self.connection)
+
+    def save_user(self, username, password):
+        """Insert a new user."""
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (username.upper(), password))
+
+
+class DbmUserMapping(Mapping):
+    """Read-only mapping of USERNAME -> password answered by on-disk hash lookups."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, username):
+        with self.store.opened() as db:
+            return db[username.upper()].decode()
+
+    def __contains__(self, username):
+        with self.store.opened() as db:
+            return username.upper() in db
+
+    def __iter__(self):
+        with self.store.opened() as db:
+            return iter([key.decode() for key in db.keys()])
+
+    def __len__(self):
+        with self.store.opened() as db:
+            return len(db)
+
+
+# The menu, the server and every --all-venues worker share users.dbm, so no process keeps it open:
+# gdbm locks out a second writer, and dbm.dumb rewrites its whole index on close (the last writer wins).
+# Each lookup or signup opens the file under a lock file instead, shared for reads and exclusive for writes.
+class DbmUserStore:
+    def __init__(self, db_path):
+        """Create the dbm file of USERNAME -> password hash if needed."""
+        self.db_path = db_path
+        self.lock_path = db_path + ".lock"
+        with self.opened("c"):
+            pass
+
+    @contextmanager
+    def opened(self, flag="r"):
+        """Open the dbm file for one operation, holding the lock until it is closed again."""
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_SH if flag == "r" else fcntl.LOCK_EX)
+            db = dbm.open(self.db_path, flag)
+            try:
+                yield db
+            finally:
+                db.close()
+
+    def load_users(self):
+        """Return a lazy mapping; nothing is read until a username is looked up."""
+        return DbmUserMapping(self)
+
+    def save_user(self, username, password):
+        """Store a user; the file is flushed when it is closed."""
+        with self.opened("w") as db:
+            db[username.upper()] = password
+
+    def close(self):
+        """Nothing to close: the dbm file is only open during an operation."""
+
+
+def create_user_store(file_path, backend=None):
+    """Create the user store selected by config.USER_STORE_BACKEND (or config.STORAGE_BACKEND)."""
+    backend = backend or config.USER_STORE_BACKEND or config.STORAGE_BACKEND
+    if backend == "sqlite":
+        return SqliteUserStore(config.SQLITE_DB_PATH)
+    if backend == "dbm":
+        is_new = dbm.whichdb(config.USERS_DBM_PATH) is None
+        store = DbmUserStore(config.USERS_DBM_PATH)
+        if is_new and os.path.exists(file_path):
+            migrate_users(file_path, store)  # First start after the switch: import users.csv once
+        return store
+    return CsvUserStore(file_path)
+
+
+def migrate_users(users_path, user_store):
+    """Copy the users from a CSV file into another user store, hashing plain-text passwords. Returns the count."""
+    users = CsvUserStore(users_path).load_users()
+    for username, password in users.items():
+        user_store.save_user(username, password if is_password_hash(password) else hash_password(password))
+    return len(users)
+
+
+def migrate_csv_to_sqlite(bookings_path, users_path, db_path, time_key):
+    """Copy bookings (history, snapshot and journal) and users from the CSV files into a SQLite database."""
+    booking_store = SqliteBookingStore(db_path)
+    csv_store = CsvBookingStore(bookings_path)
+    bookings = list(iter_bookings(csv_store.history_path)) + csv_store.load()
+    with booking_store.connection:
+        booking_store.connection.execute("DELETE FROM bookings")
+        booking_store.insert_many(
+            (booking, time_key(booking.start_time), time_key(booking.end_time)) for booking in bookings)
+    booking_store.close()
+
+    user_store = SqliteUserStore(db_path)
+    user_count = migrate_users(users_path, user_store)
+    user_store.connection.close()
+    return len(bookings), user_count
+
+
+if __name__ == "__main__":
+    from bookings import BOOKINGS_FILE_PATH, Bookings
+    from users import FILE_PATH as USERS_FILE_PATH
+
+    parser = argparse.ArgumentParser(description="Maintain the court booking data files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="copy the CSV data files into a SQLite database")
+    migrate.add_argument("--bookings", default=BOOKINGS_FILE_PATH, help="bookings CSV snapshot")
+    migrate.add_argument("--users", default=USERS_FILE_PATH, help="users CSV file")
+    migrate.add_argument("--db", default=config.SQLITE_DB_PATH, help="SQLite database to create")
+    users = commands.add_parser("users", help="copy users.csv into the dbm user store, hashing passwords")
+    users.add_argument("--users", default=USERS_FILE_PATH, help="users CSV file")
+    users.add_argument("--dbm", default=config.USERS_DBM_PATH, help="dbm file to create or update")
+    partition = commands.add_parser("partition", help="move bookings.csv into per-week calendar partitions")
+    partition.add_argument("--bookings", default=BOOKINGS_FILE_PATH, help="bookings CSV snapshot")
+    partition.add_argument("--dir", default=None, help="partition directory (default: next to the CSV)")
+    archive = commands.add_parser("archive", help="move bookings that are no longer active to the history file")
+    archive.add_argument("--bookings", default=BOOKINGS_FILE_PATH, help="bookings CSV snapshot")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        booking_count, user_count = migrate_csv_to_sqlite(
+            args.bookings, args.users, args.db, Bookings.time_to_minutes)
+        print(f"Migrated {booking_count} bookings and {user_count} users to {args.db}.")
+    elif args.command == "users":
+        user_store = DbmUserStore(args.dbm)
+        user_count = migrate_users(args.users, user_store)
+        user_store.close()
+        print(f"Migrated {user_count} users to {args.dbm}.")
+    elif args.command == "partition":
+        directory = args.dir or partitions_dir(args.bookings)
+        booking_count = partition_bookings(args.bookings, directory)
+        print(f"Partitioned {booking_count} bookings into {directory}.")
+    else:
+        live_count, archived_count = archive_bookings(args.bookings)
+        print(f"Archived {archived_count} bookings; {live_count} live bookings remain in {args.bookings}.")
@@ -0,0 +1,27 @@
+# tests/test_availability_search.py
+
+import unittest
+from filter_courts import CourtFilter
+from availability_search import find_alternative_slots, cached_alternative_slots
+
+
+class UnderLimitSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.court_filter = CourtFilter()
+
+    def test_returns_every_slot_found_when_under_the_limit(self):
+        results = find_alternative_slots(self.court_filter, 0, "08:00 AM", "A", 1, 2, 100)
+        self.assertIsInstance(results, list)
+        self.assertTrue(0 < len(results) < 100)
+        self.assertEqual(results[0], {'court': 'A', 'time': "08:00 AM", 'slots': ["08:00 AM", "08:30 AM"],
+                                      'type': 'preferred', 'distance': 0})
+
+    def test_under_limit_results_are_cached(self):
+        first = cached_alternative_slots(self.court_filter, 0, "08:00 AM", "A", 1, 2, 100)
+        second = cached_alternative_slots(self.court_filter, 0, "08:00 AM", "A", 1, 2, 100)
+        self.assertIs(first, second)
+        self.assertEqual(self.court_filter.search_cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+# tests/test_instrumentation.py
+
+import os
+import sys
+import subprocess
+import tempfile
+import textwrap
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# @instrument decides at import time whether to profile, so the scenario runs in a fresh interpreter
+CANCEL_WITH_WAITER = textwrap.dedent("""
+    import pstats
+    from bookings import Bookings
+    from waitlist import Waitlist, PROMOTED
+    import instrumentation
+
+    bookings = Bookings("bookings.csv")
+    waitlist = Waitlist(bookings, auto_promote=True)
+    bookings.subscribe(waitlist.apply_booking_event)
+    booking, _ = bookings.try_create_booking("A", "Monday", "08:00 AM", "09:00 AM", 1.0, "ann")
+    waitlist.join("bob", "A", "Monday", "08:00 AM", "09:00 AM", 1.0)
+    canceled, error = bookings.try_cancel_booking(booking.booking_id, "ann")
+    assert error is None, error
+    assert [entry.status for entry in waitlist.entries.values()] == [PROMOTED]
+    functions = {function for _, _, function in pstats.Stats(instrumentation.profiles["cancel_user_booking"]).stats}
+    assert "try_create_booking" in functions, "the promotion is missing from the cancel profile"
+    assert instrumentation.active_profile is None
+""")
+
+
+class NestedProfileTest(unittest.TestCase):
+    def test_cancel_with_waiter_while_profiling(self):
+        env = dict(os.environ, PYTHONPATH=REPO_DIR, COURT_BOOKING_STATS="1",
+                   COURT_BOOKING_PROFILE="cancel_user_booking,create_booking")
+        with tempfile.TemporaryDirectory() as directory:
+            run = subprocess.run([sys.executable, "-c", CANCEL_WITH_WAITER], cwd=directory, env=env,
+                                 capture_output=True, text=True)
+        self.assertEqual(run.returncode, 0, run.stderr)
@@ -0,0 +1,43 @@
+# tests/test_storage_journal.py
+
+import os
+import tempfile
+import unittest
+from storage import Booking, CsvBookingStore
+
+
+def booking(booking_id, status="active"):
+    return Booking(booking_id, "A", "Monday", "08:00 AM", "09:00 AM", "1.0 hour", status, "Ann")
+
+
+class TornJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "bookings.csv")
+        CsvBookingStore(self.path).save_all([booking(1)], 1)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_torn_record(self, text):
+        """Append a record cut off before its newline, as a crash mid-write leaves it."""
+        with open(os.path.splitext(self.path)[0] + ".journal", "a", newline='') as file:
+            file.write(text)
+
+    def test_torn_tail_is_ignored_on_replay(self):
+        store = CsvBookingStore(self.path)
+        store.record_create(booking(2), [])
+        self.write_torn_record("status,2,cancel")  # 'canceled' cut short
+        self.assertEqual([b.status for b in CsvBookingStore(self.path).load()], ["active", "active"])
+
+    def test_append_after_torn_tail_is_replayed(self):
+        self.write_torn_record("create,2,A,Mon")
+        store = CsvBookingStore(self.path)
+        store.record_create(booking(3), [])
+        store.record_status(1, "canceled", [])
+        loaded = {b.booking_id: b.status for b in CsvBookingStore(self.path).load()}
+        self.assertEqual(loaded, {1: "canceled", 3: "active"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# time_slots.py
+
+import math
+from datetime import datetime
+from config import VALID_TIME_SLOTS
+
+TIME_FORMAT = "%I:%M %p"
+
+
+def time_from_minutes(minutes):
+    """Format minutes since midnight as an HH:MM AM/PM string."""
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    return f"{(hour - 1) % 12 + 1:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def parse_minutes(time_str):
+    """Parse an HH:MM AM/PM string to minutes since midnight (the slow path, used once per string)."""
+    parsed = datetime.strptime(time_str.strip().upper(), TIME_FORMAT)
+    return parsed.hour * 60 + parsed.minute
+
+
+def slot_times(opens, closes, slot_minutes=30):
+    """Return the slot start times from `opens` up to (not including) `closes`."""
+    return [time_from_minutes(m) for m in range(parse_minutes(opens), parse_minutes(closes), slot_minutes)]
+
+
+# 1. Separating Functions and Data:
+# All slot arithmetic runs on integer indexes into the slot list. Boundaries are the slot
+# start times plus the closing time, so index i is both "slot i" and "the start of slot i",
+# and a booking covering slots [start, end) is described by two boundary indexes.
+class SlotTable:
+    def __init__(self, time_slots, slot_minutes=30):
+        """Build the lookup tables from an ordered list of slot start times."""
+        self.slot_minutes = slot_minutes
+        self.times = tuple(time_slots)
+        self.count = len(self.times)
+        start_minutes = [parse_minutes(time_str) for time_str in self.times]  # 10. List Comprehensions
+        self.minutes = tuple(start_minutes + [start_minutes[-1] + slot_minutes])
+        self.closing_time = time_from_minutes(self.minutes[-1])
+        self.boundaries = self.times + (self.closing_time,)
+        self.index = {time_str: i for i, time_str in enumerate(self.boundaries)}
+        self.minutes_cache = dict(zip(self.boundaries, self.minutes))
+
+    def slot_index(self, time_str):
+        """Return the slot index of a bookable start time, or None."""
+        index = self.index.get(time_str)
+        return index if index is not None and index < self.count else None
+
+    def boundary_index(self, time_str):
+        """Return the boundary index of a start or end time (closing time included), or None."""
+        return self.index.get(time_str)
+
+    def to_minutes(self, time_str):
+        """Return minutes since midnight for a time string, parsing off-grid times only once."""
+        minutes = self.minutes_cache.get(time_str)
+        if minutes is None:
+            minutes = self.minutes_cache[time_str] = parse_minutes(time_str)
+        return minutes
+
+    def normalize(self, text):
+        """Return the canonical HH:MM AM/PM form of user input (e.g. '2:00 pm'), or None if invalid."""
+        time_str = text.strip().upper()
+        if time_str in self.index:
+            return time_str
+        try:
+            return time_from_minutes(parse_minutes(time_str))
+        except ValueError:
+            return None
+
+    def duration_slots(self, duration_hours):
+        """Convert a duration in hours to a slot count, or None if it is not a positive whole number of slots."""
+        slots = duration_hours * 60 / self.slot_minutes
+        if not math.isfinite(slots) or slots <= 0 or slots != int(slots):
+            return None
+        return int(slots)
+
+    def end_time(self, start_time, duration_hours):
+        """Return the end time of a booking, or None if it would run past closing time."""
+        start, length = self.boundary_index(start_time), self.duration_slots(duration_hours)
+        if start is None or length is None or start + length > self.count:
+            return None
+        return self.boundaries[start + length]
+
+    def slots_between(self, start_time, end_time):
+        """Return the slot start times in [start_time, end_time)."""
+        start, end = self.boundary_index(start_time), self.boundary_index(end_time)
+        if start is not None and end is not None:
+            return list(self.times[start:end])
+        # Off-grid times (e.g. legacy rows) fall back to minute arithmetic
+        return [time_from_minutes(m) for m in range(self.to_minutes(start_time), self.to_minutes(end_time), self.slot_minutes)]
+
+    def slot_range(self, start_time, end_time):
+        """Return (start, length) of the on-grid slots covered by [start_time, end_time), clipped to opening hours."""
+        start, end = self.boundary_index(start_time), self.boundary_index(end_time)
+        if start is None or end is None:
+            first = self.minutes[0]
+            start = max(0, -(-(self.to_minutes(start_time) - first) // self.slot_minutes))
+            end = min(self.count, (self.to_minutes(end_time) - first) // self.slot_minutes)
+        return start, max(0, end - start)
+
+    def format_duration(self, duration_hours):
+        """Format a duration the way bookings store it (e.g. '1.5 hours')."""
+        return f"{duration_hours} hour{'s' if duration_hours != 1 else ''}"
+
+
+# Shared table built once from the configured time slots
+SLOTS = SlotTable(VALID_TIME_SLOTS)
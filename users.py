@@ -1,33 +1,44 @@
 # users.py
 
-import os
-import csv
 from functools import partial
+from storage import create_user_store
+from credentials import SessionCache, hash_password
+import instrumentation
 
 # File to store usernames and passwords
 FILE_PATH = "data/users.csv"
 
 # 1. Separating Functions and Data:
-# The data (usernames and passwords) is stored in a CSV file, separate from the functions
+# The data (usernames and password hashes) is stored in a user store, separate from the functions
 # that manipulate this data.
 
-# Function to load users from the CSV file
+# The user store (dbm file, CSV file or SQLite table) is created on first use
+user_store = None
+# Recently verified logins, so repeat logins skip the password hashing cost
+sessions = SessionCache()
+
+def get_user_store():
+    """Return the configured user store."""
+    global user_store
+    if user_store is None:
+        user_store = create_user_store(FILE_PATH)
+    return user_store
+
+# Function to load users from the user store
+@instrumentation.instrument("load_users")
 def load_users():
-    """Load users from the CSV file."""
-    if os.path.exists(FILE_PATH):
-        with open(FILE_PATH, "r", newline='') as file:
-            reader = csv.DictReader(file)
-            # 10. List Comprehension: Creating a dictionary of users
-            users = {row['username'].strip().upper(): row['password'].strip() for row in reader if row['username'].strip()}  # 10. List Comprehension
-            return users
-    return {}
-
-# Function to save a new user to the CSV file
+    """Load users from the user store."""
+    users = get_user_store().load_users()
+    if instrumentation.ENABLED:
+        instrumentation.count_rows("load_users", len(users))
+    return users
+
+# Function to save a new user to the user store
 def save_user(username, password):
-    """Save a new user to the CSV file."""
-    with open(FILE_PATH, "a", newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([username.upper(), password])  # 10. List Comprehension
+    """Save a new user (with a salted hash of the password) to the user store. Returns the stored hash."""
+    password_hash = hash_password(password)
+    get_user_store().save_user(username, password_hash)
+    return password_hash
 
 # 4. Passing Functions as Arguments:
 def get_user_input(prompt):
@@ -42,11 +53,22 @@ def sign_up(users):
         print("\nUsername already exists. Please try a different username.")
     else:
         password = get_user_input("\nEnter a password: ").strip()
-        save_user(username, password)
-        users = {**users, username: password}  # 8. Reducing
+        password_hash = save_user(username, password)
+        if isinstance(users, dict):
+            users = {**users, username: password_hash}  # 8. Reducing
+        # Store-backed mappings already see the new user
         print("\nSign up successful!")
     return users
 
+# Check a username/password pair without prompting
+def authenticate(users, username, password):
+    """Return the normalized username if the credentials are valid, otherwise None."""
+    username = username.strip().upper()
+    stored = users.get(username)
+    if stored is not None and sessions.verify(username, stored, password):
+        return username
+    return None
+
 # Log in an existing user
 def log_in(users):
     """Authenticate an existing user."""
@@ -56,7 +78,7 @@ def log_in(users):
         return None  
     else:
         password = get_user_input("\nEnter your password: ").strip()
-        if users[username] == password:
+        if authenticate(users, username, password):
             print("\nPassword is correct. You are logged in!")
             return username  
         else:
@@ -0,0 +1,68 @@
+# venues.py
+
+import os
+import config
+from time_slots import SLOTS, SlotTable, slot_times
+
+
+# 1. Separating Functions and Data:
+# A venue bundles its configuration (courts, hours, slot length) with the paths of its own data files,
+# so each venue's Bookings and CourtFilter state is a separate shard that can live in its own process.
+class Venue:
+    def __init__(self, name, courts, opens, closes, slot_minutes=30, data_dir=None):
+        """Initialize a venue from its configuration."""
+        self.name = name
+        self.courts = list(courts)
+        times = slot_times(opens, closes, slot_minutes)
+        # Venues with the default hours share the module-wide slot table
+        self.slots = SLOTS if tuple(times) == SLOTS.times and slot_minutes == SLOTS.slot_minutes else SlotTable(times, slot_minutes)
+        self.data_dir = data_dir or os.path.join(config.VENUES_DIR, name)
+
+    @property
+    def bookings_path(self):
+        """The venue's bookings CSV snapshot."""
+        return os.path.join(self.data_dir, "bookings.csv")
+
+    @property
+    def sqlite_path(self):
+        """The venue's SQLite database (SQLite backend)."""
+        if self.data_dir == os.path.dirname(config.SQLITE_DB_PATH):
+            return config.SQLITE_DB_PATH
+        return os.path.join(self.data_dir, os.path.basename(config.SQLITE_DB_PATH))
+
+    @property
+    def court_label(self):
+        """Describe the court IDs for prompts and messages, e.g. 'A-H'."""
+        return f"{self.courts[0]}-{self.courts[-1]}" if len(self.courts) > 1 else self.courts[0]
+
+
+def load_venues(settings=None):
+    """Build every configured venue, keyed by name."""
+    settings = config.VENUES if settings is None else settings
+    venues = {}
+    for name, options in settings.items():
+        # The default venue keeps the original data/ directory
+        data_dir = "data" if name == config.DEFAULT_VENUE else None
+        venues[name] = Venue(name, options["courts"], options["opens"], options["closes"],
+                             options.get("slot_minutes", 30), data_dir)
+        os.makedirs(venues[name].data_dir, exist_ok=True)
+    return venues
+
+
+# Venues are built on first use
+venues = None
+
+def get_venue(name=None):
+    """Return a configured venue (the default one if no name is given)."""
+    global venues
+    if venues is None:
+        venues = load_venues()
+    name = name or config.DEFAULT_VENUE
+    if name not in venues:
+        raise KeyError(f"Unknown venue: {name}")
+    return venues[name]
+
+
+def venue_names():
+    """Return the names of the configured venues, the default first."""
+    return [config.DEFAULT_VENUE] + [name for name in config.VENUES if name != config.DEFAULT_VENUE]
@@ -0,0 +1,247 @@
+# waitlist.py
+#
+# Waitlist of users waiting for a slot to open: (day, court or any court, time window, duration).
+# Waiting entries are kept in an interval index per (court, day), so a cancellation only visits the
+# waiters whose window overlaps the freed slot. Those are served first come, first served (by entry ID):
+# booked into the freed slot (config.WAITLIST_AUTO_PROMOTE), or notified at their next login.
+# Entries are persisted next to the venue's bookings (data/waitlist.csv).
+
+import os
+import csv
+from datetime import date
+from functools import partial
+from collections import namedtuple
+from interval_index import IntervalIndex
+from calendar_days import parse_date
+from storage import file_signature
+import config
+
+WAITLIST_FIELDS = ['entry_id', 'username', 'court_id', 'day', 'start_time', 'end_time', 'duration_hours', 'status', 'booking_id']
+
+# A waitlist entry: any start between start_time and end_time - duration on the court (or ANY court) will do
+WaitlistEntry = namedtuple('WaitlistEntry', WAITLIST_FIELDS)
+
+# Court ID of entries that take whichever court frees up
+ANY_COURT = "ANY"
+# Waiting entries are indexed; promoted and notified ones wait for their user to see the outcome
+WAITING, PROMOTED, NOTIFIED = "waiting", "promoted", "notified"
+
+
+def waitlist_path(bookings_path):
+    """Return the waitlist file stored next to a bookings CSV snapshot."""
+    return os.path.join(os.path.dirname(bookings_path), "waitlist.csv")
+
+
+def row_to_entry(row):
+    """Convert a CSV row to a WaitlistEntry."""
+    return WaitlistEntry(
+        entry_id=int(row['entry_id']),
+        username=row['username'],
+        court_id=row['court_id'],
+        day=row['day'],
+        start_time=row['start_time'],
+        end_time=row['end_time'],
+        duration_hours=float(row['duration_hours']),
+        status=row['status'],
+        booking_id=int(row['booking_id']) if row['booking_id'] else None
+    )
+
+
+# 1. Separating Functions and Data:
+# The waitlist keeps its own entries and index, and learns about cancellations from the
+# 'cancel' events Bookings emits, the same way CourtFilter keeps the grid in sync.
+class Waitlist:
+    def __init__(self, bookings, file_path=None, auto_promote=None):
+        """Initialize the waitlist of a venue's bookings and load the saved entries."""
+        self.bookings = bookings
+        self.venue = bookings.venue
+        self.slots = bookings.slots
+        self.file_path = file_path or waitlist_path(bookings.file_path)
+        self.auto_promote = config.WAITLIST_AUTO_PROMOTE if auto_promote is None else auto_promote
+        self.load()
+
+    def load(self):
+        """Load the saved entries and index the waiting ones."""
+        self.entries = {}  # entry_id -> WaitlistEntry, oldest first
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r", newline='') as file:
+                for row in csv.DictReader(file):
+                    entry = row_to_entry(row)
+                    self.entries[entry.entry_id] = entry
+        self.next_entry_id = max(self.entries, default=0) + 1
+        if config.CALENDAR_DATES:
+            # Waiting for a date that has passed is pointless
+            today = date.today()
+            for entry in list(self.entries.values()):
+                day_date = parse_date(entry.day)
+                if entry.status == WAITING and (day_date is None or day_date < today):
+                    del self.entries[entry.entry_id]
+        self.index = IntervalIndex()
+        for entry in self.entries.values():
+            if entry.status == WAITING:
+                self.index_entry(entry)
+        self.loaded_signature = file_signature(self.file_path)
+
+    def reload_if_changed(self):
+        """Reload only if the waitlist file changed since it was last read or written here."""
+        if file_signature(self.file_path) == self.loaded_signature:
+            return False
+        self.load()
+        return True
+
+    def save(self):
+        """Write every entry to the waitlist file."""
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "w", newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(WAITLIST_FIELDS)
+            writer.writerows([*entry[:-1], "" if entry.booking_id is None else entry.booking_id]
+                             for entry in self.entries.values())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.file_path)  # Readers never see a half-written waitlist
+        self.loaded_signature = file_signature(self.file_path)
+
+    def index_entry(self, entry):
+        """Add a waiting entry's window to the index."""
+        self.index.add(entry.court_id, entry.day, self.slots.to_minutes(entry.start_time),
+                       self.slots.to_minutes(entry.end_time), entry.entry_id)
+
+    def unindex_entry(self, entry):
+        """Remove an entry's window from the index."""
+        self.index.remove(entry.court_id, entry.day, self.slots.to_minutes(entry.start_time),
+                          self.slots.to_minutes(entry.end_time), entry.entry_id)
+
+    def validate_entry(self, court_id, day, start_time, end_time, duration_hours):
+        """Return an error message if a waitlist request is invalid, or None."""
+        if court_id != ANY_COURT and court_id not in self.venue.courts:
+            return f"Invalid court ID. Please choose between {self.venue.court_label} or {ANY_COURT}."
+        start_index = self.slots.slot_index(start_time)
+        end_index = self.slots.boundary_index(end_time)
+        if start_index is None or end_index is None or end_index <= start_index:
+            return f"Invalid time range. Please enter HH:MM AM/PM times on the {self.slots.slot_minutes}-minute slots within opening hours."
+        duration_slots = self.slots.duration_slots(duration_hours)
+        if duration_slots is None:
+            return f"Invalid duration. Please enter a positive number of hours in {self.slots.slot_minutes}-minute increments."
+        if duration_slots > end_index - start_index:
+            return "Invalid duration. It does not fit between the start and end time."
+        # The day is checked like a booking's: any valid booking inside the window must pass
+        return self.bookings.validate_booking(
+            self.venue.courts[0] if court_id == ANY_COURT else court_id, day, start_time,
+            self.slots.end_time(start_time, duration_hours), duration_hours)
+
+    def try_join(self, username, court_id, day, start_time, end_time, duration_hours):
+        """Add a waiting entry without printing. Returns (entry, None) or (None, error message)."""
+        court_id, day = court_id.strip().upper(), day.capitalize()
+        start_time, end_time = start_time.upper(), end_time.upper()
+        error = self.validate_entry(court_id, day, start_time, end_time, duration_hours)
+        if error:
+            return None, error
+        if any(entry.status == WAITING and entry.username.lower() == username.lower() and entry[2:7] == (court_id, day, start_time, end_time, float(duration_hours))
+               for entry in self.entries.values()):
+            return None, "You are already on the waitlist for this slot."
+        entry = WaitlistEntry(self.next_entry_id, username.capitalize(), court_id, day, start_time, end_time,
+                              float(duration_hours), WAITING, None)
+        self.next_entry_id += 1
+        self.entries[entry.entry_id] = entry
+        self.index_entry(entry)
+        self.save()
+        return entry, None
+
+    def join(self, username, court_id, day, start_time, end_time, duration_hours):
+        """Add the user to the waitlist for a slot."""
+        entry, error = self.try_join(username, court_id, day, start_time, end_time, duration_hours)
+        if error:
+            print(error)
+            return False
+        print(f"You are on the waitlist (entry {entry.entry_id}).")
+        return True
+
+    def try_withdraw(self, entry_id, username):
+        """Remove a user's waiting entry. Returns (entry, None) or (None, error message)."""
+        entry = self.entries.get(entry_id)
+        if entry is None or entry.status != WAITING or entry.username.lower() != username.lower():
+            return None, f"Waitlist entry {entry_id} is either not waiting, does not exist, or does not belong to you."
+        self.unindex_entry(entry)
+        del self.entries[entry_id]
+        self.save()
+        return entry, None
+
+    def user_entries(self, username):
+        """Return a user's entries, oldest first."""
+        # 7. Filtering: only the user's own entries
+        return [entry for entry in self.entries.values() if entry.username.lower() == username.lower()]
+
+    def take_notifications(self, username):
+        """Return the user's promoted and notified entries, removing them now that the user has seen them."""
+        finished = [entry for entry in self.user_entries(username) if entry.status != WAITING]
+        if finished:
+            for entry in finished:
+                del self.entries[entry.entry_id]
+            self.save()
+        return finished
+
+    def apply_booking_event(self, event, booking):
+        """Booking event listener: offer slots freed by a cancellation to the waitlist."""
+        if event == 'cancel':
+            # Promotions create bookings, so they wait until every listener has seen the cancellation
+            self.bookings.call_after_emit(partial(self.promote, booking))
+
+    def find_start(self, entry, court_id, freed):
+        """Return (start_time, end_time) of the earliest free run in the entry's window that uses the freed slots, or None."""
+        length = self.slots.duration_slots(entry.duration_hours)
+        freed_start, freed_length = self.slots.slot_range(freed.start_time, freed.end_time)
+        # Runs that use a freed slot start at most length - 1 slots before it, and inside the window
+        first = max(self.slots.boundary_index(entry.start_time), freed_start - length + 1)
+        last = min(self.slots.boundary_index(entry.end_time) - length, freed_start + freed_length - 1)
+        for start in range(first, last + 1):
+            start_time, end_time = self.slots.boundaries[start], self.slots.boundaries[start + length]
+            if self.bookings.find_conflict(court_id, entry.day, start_time, end_time) is None:
+                return start_time, end_time
+        return None
+
+    def promote(self, freed):
+        """
+        Serve the waiters whose window overlaps a freed booking, first come, first served.
+        Returns the entries that were promoted (booked) or notified.
+        """
+        freed_start, freed_end = self.slots.to_minutes(freed.start_time), self.slots.to_minutes(freed.end_time)
+        # Only entries for this court, or for any court, on this day can use the freed slot
+        candidates = sorted(self.index.overlapping(freed.court_id, freed.day, freed_start, freed_end)
+                            + self.index.overlapping(ANY_COURT, freed.day, freed_start, freed_end))
+        served = []
+        for entry_id in candidates:
+            entry = self.entries[entry_id]
+            slot = self.find_start(entry, freed.court_id, freed)
+            if slot is None:
+                continue
+            if self.auto_promote:
+                booking, error = self.bookings.try_create_booking(
+                    freed.court_id, entry.day, *slot, entry.duration_hours, entry.username)
+                if error:
+                    continue
+                entry = entry._replace(court_id=freed.court_id, start_time=slot[0], end_time=slot[1],
+                                       status=PROMOTED, booking_id=booking.booking_id)
+            else:
+                entry = entry._replace(court_id=freed.court_id, start_time=slot[0], end_time=slot[1], status=NOTIFIED)
+            self.unindex_entry(self.entries[entry_id])
+            self.entries[entry_id] = entry
+            served.append(entry)
+        if served:
+            self.save()
+        return served
+
+    def show_notifications(self, username):
+        """Print (and clear) the outcome of the user's waitlist entries."""
+        for entry in self.take_notifications(username):
+            if entry.status == PROMOTED:
+                print(f"Waitlist: you were booked on court {entry.court_id}, {entry.day} {entry.start_time}-{entry.end_time} (Booking ID {entry.booking_id}).")
+            else:
+                print(f"Waitlist: court {entry.court_id} is free on {entry.day} {entry.start_time}-{entry.end_time}. Book it before someone else does!")
+
+
+def open_waitlist(bookings):
+    """Return the waitlist of a venue's bookings, subscribed to its cancellations."""
+    waitlist = Waitlist(bookings)
+    bookings.subscribe(waitlist.apply_booking_event)  # 4. Passing functions as arguments
+    return waitlist